@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare full html.parser parsing with the targeted src.markup parsing on saved pages.
+
+Usage: python benchmarks/bench_html.py [fixture_dir] [--rounds N]
+
+Fixture files are matched to the strainer their scraper uses by name prefix,
+e.g. apkmirror-uploads.html or uptodown-version.html.
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src import markup  # noqa: E402
+
+FIXTURE_STRAINERS = {
+    "apkmirror-uploads": markup.APKMIRROR_APP_ROWS,
+    "apkmirror-release": markup.LINKS,
+    "apkmirror-variant": markup.LINKS,
+    "apkpure-versions": markup.APKPURE_VERSION,
+    "apkpure-download": markup.APKPURE_DOWNLOAD_LINK,
+    "uptodown-versions": markup.UPTODOWN_VERSIONS,
+    "uptodown-version": markup.UPTODOWN_DOWNLOAD_BUTTON,
+}
+
+def strainer_for(path: Path):
+    # Longest prefix wins, so uptodown-versions is not taken for uptodown-version
+    for prefix in sorted(FIXTURE_STRAINERS, key=len, reverse=True):
+        if path.name.startswith(prefix):
+            return FIXTURE_STRAINERS[prefix]
+    return None
+
+def measure(parse, rounds: int) -> tuple[float, int]:
+    """Best CPU time over rounds and peak traced memory of one parse"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.process_time()
+        parse()
+        best = min(best, time.process_time() - start)
+
+    tracemalloc.start()
+    parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixture_dir", nargs="?", default=Path(__file__).parent / "fixtures", type=Path)
+    parser.add_argument("--rounds", type=int, default=5)
+    options = parser.parse_args()
+
+    fixtures = [(path, strainer_for(path)) for path in sorted(options.fixture_dir.rglob("*.html"))]
+    fixtures = [(path, strainer) for path, strainer in fixtures if strainer is not None]
+    if not fixtures:
+        print(f"No fixture pages found in {options.fixture_dir}")
+        return 1
+
+    print(f"Backend: {markup.PARSER} + SoupStrainer vs html.parser full tree, best of {options.rounds}\n")
+    print(f"{'Page':<32} {'full ms':>9} {'fast ms':>9} {'speedup':>8} {'full KiB':>9} {'fast KiB':>9}")
+    for path, strainer in fixtures:
+        html = path.read_bytes()
+        full_time, full_mem = measure(lambda: BeautifulSoup(html, "html.parser"), options.rounds)
+        fast_time, fast_mem = measure(lambda: markup.parse(html, strainer), options.rounds)
+        print(
+            f"{path.name:<32} {full_time * 1000:>9.2f} {fast_time * 1000:>9.2f} "
+            f"{full_time / max(fast_time, 1e-9):>7.1f}x {full_mem / 1024:>9.0f} {fast_mem / 1024:>9.0f}"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Benchmark the mirror scrapers offline against recorded pages.
+
+Usage: python benchmarks/bench_scrapers.py [--rounds N] [--update-baseline]
+
+Every provider's get_latest_version / get_download_link runs against a local
+stand-in serving benchmarks/fixtures (see standin.py), starting from cold
+caches each round. The run fails when a case makes more requests than the
+baseline, reads noticeably more bytes, or its parse CPU or latency grows by
+more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+FIXTURE_DIR = BENCH_DIR / "fixtures"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+# Caches must not survive between rounds or leak into the real cache
+CACHE_ROOT = Path(tempfile.mkdtemp(prefix="scraper-bench-"))
+os.environ["CACHE_DIR"] = str(CACHE_ROOT)
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import requests  # noqa: E402
+from src import session, limits, markup, pages, scrapers, aptoide, uptodown, apkpure, apkmirror  # noqa: E402
+import standin  # noqa: E402
+
+CONFIG = {
+    "org": "google-inc",
+    "name": "youtube",
+    "package": "com.google.android.youtube",
+    "arch": "universal",
+    "version": ""
+}
+
+CASES = {
+    "apkmirror.get_latest_version": lambda: apkmirror.get_latest_version("youtube", CONFIG),
+    "apkmirror.get_download_link": lambda: apkmirror.get_download_link("19.16.39", "youtube", CONFIG),
+    "apkpure.get_latest_version": lambda: apkpure.get_latest_version("youtube", CONFIG),
+    "apkpure.get_download_link": lambda: apkpure.get_download_link("19.16.39", "youtube", CONFIG),
+    "uptodown.get_latest_version": lambda: uptodown.get_latest_version("youtube", CONFIG),
+    "uptodown.get_download_link": lambda: uptodown.get_download_link("19.10.37", "youtube", CONFIG),
+    "aptoide.get_latest_version": lambda: aptoide.get_latest_version("youtube", CONFIG),
+    "aptoide.get_download_link": lambda: aptoide.get_download_link("19.0.35", "youtube", CONFIG),
+}
+
+# Byte counts are deterministic but allow for small fixture edits
+BYTES_TOLERANCE = 0.05
+# Sub-millisecond cases would otherwise fail on scheduler noise alone
+TIMING_FLOOR_MS = 2.0
+
+class ParseTimer:
+    """CPU time spent turning responses into trees or JSON"""
+    def __init__(self):
+        self.cpu = 0.0
+        self._parse = markup.parse
+        self._json = requests.Response.json
+
+    def install(self) -> None:
+        timer = self
+
+        def parse(*args, **kwargs):
+            start = time.thread_time()
+            try:
+                return timer._parse(*args, **kwargs)
+            finally:
+                timer.cpu += time.thread_time() - start
+
+        def decode(response, *args, **kwargs):
+            start = time.thread_time()
+            try:
+                return timer._json(response, *args, **kwargs)
+            finally:
+                timer.cpu += time.thread_time() - start
+
+        markup.parse = parse
+        requests.Response.json = decode
+
+def reset_caches() -> None:
+    """Start every round as a first run would: no page, listing or index cache"""
+    shutil.rmtree(CACHE_ROOT, ignore_errors=True)
+    CACHE_ROOT.mkdir(parents=True)
+    pages._pages.clear()
+    aptoide._listings.clear()
+    aptoide._searches.clear()
+    # Slugs are remembered across runs, probing them is a one-off cost
+    uptodown._update_index(CONFIG["package"], slug="youtube")
+
+def run_case(name: str, call, server, timer: ParseTimer) -> dict:
+    reset_caches()
+    server.stats.reset()
+    timer.cpu = 0.0
+    start = time.perf_counter()
+    result = call()
+    latency = time.perf_counter() - start
+    if not result:
+        raise RuntimeError(f"{name} returned {result!r}, fixtures missed: {server.stats.misses}")
+    return {
+        "result": result,
+        "requests": server.stats.requests,
+        "bytes": server.stats.bytes,
+        "parse_cpu_ms": timer.cpu * 1000,
+        "latency_ms": latency * 1000
+    }
+
+def check(name: str, measured: dict, baseline: dict, tolerance: float) -> list[str]:
+    expected = baseline.get(name)
+    if not expected:
+        return []
+    failures = []
+    if measured["requests"] > expected["requests"]:
+        failures.append(f"requests {measured['requests']} > {expected['requests']}")
+    if measured["bytes"] > expected["bytes"] * (1 + BYTES_TOLERANCE):
+        failures.append(f"bytes {measured['bytes']} > {expected['bytes']}")
+    for metric in ("parse_cpu_ms", "latency_ms"):
+        if measured[metric] > max(expected[metric] * (1 + tolerance), expected[metric] + TIMING_FLOOR_MS):
+            failures.append(f"{metric} {measured[metric]:.1f} > {expected[metric]:.1f} +{tolerance:.0%}")
+    return failures
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="cold runs per case, the median is reported")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown of CPU and latency")
+    parser.add_argument("--only", nargs="+", metavar="CASE", help="run only these cases")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write the results to {BASELINE_PATH.name}")
+    options = parser.parse_args()
+
+    # The stand-in answers instantly, real request budgets would only add sleeps
+    limits.HOST_RATES.clear()
+    timer = ParseTimer()
+    timer.install()
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+    results = {}
+    failed = False
+    try:
+        with standin.StandIn(FIXTURE_DIR) as server:
+            standin.install(server.origin, session, scrapers.get(apkmirror.APKMIRROR_BASE))
+            print(f"{'Case':<32} {'reqs':>5} {'KiB':>8} {'parse ms':>9} {'latency ms':>11}  status")
+            for name, call in CASES.items():
+                if options.only and name not in options.only:
+                    continue
+                # One unmeasured round warms up imports, parsers and connections
+                run_case(name, call, server, timer)
+                runs = [run_case(name, call, server, timer) for _ in range(options.rounds)]
+                measured = {
+                    "requests": max(r["requests"] for r in runs),
+                    "bytes": max(r["bytes"] for r in runs),
+                    "parse_cpu_ms": round(statistics.median(r["parse_cpu_ms"] for r in runs), 3),
+                    "latency_ms": round(statistics.median(r["latency_ms"] for r in runs), 3)
+                }
+                results[name] = measured
+                failures = check(name, measured, baseline, options.tolerance)
+                failed = failed or bool(failures)
+                print(
+                    f"{name:<32} {measured['requests']:>5} {measured['bytes'] / 1024:>8.1f} "
+                    f"{measured['parse_cpu_ms']:>9.2f} {measured['latency_ms']:>11.2f}  "
+                    f"{'REGRESSED: ' + '; '.join(failures) if failures else 'ok'}"
+                )
+    finally:
+        shutil.rmtree(CACHE_ROOT, ignore_errors=True)
+
+    if options.update_baseline:
+        BASELINE_PATH.write_text(json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Sign APKs with the in-process v2/v3 signer and with apksigner, verify both and compare.
+
+Usage: python benchmarks/bench_signing.py [APK ...] [--size-mb N] [--rounds N] [--apksigner PATH]
+
+Without APK arguments a synthetic APK of --size-mb is generated. Every
+in-process signature is checked by `apksigner verify` when build-tools are
+installed or --apksigner is given, and always by a small built-in verifier
+(digests, signatures and certificate of both the v2 and v3 block).
+"""
+import os
+import sys
+import time
+import struct
+import hashlib
+import zipfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+from src import apksign, utils  # noqa: E402
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec, padding  # noqa: E402
+
+KEYSTORE = str(ROOT / "keystore" / "public.jks")
+PASSWORD = "public"
+MIN_SDK = str(apksign.MIN_SDK_WITHOUT_V1)
+
+def make_apk(path: Path, size_mb: int) -> Path:
+    """A plausible APK layout: deflated dex and resources, stored native libs"""
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("AndroidManifest.xml", b"\x03\x00\x08\x00" + bytes(4092), zipfile.ZIP_DEFLATED)
+        written = 0
+        index = 0
+        while written < size_mb * 1024 * 1024:
+            text = (b"Lcom/example/Class%d;->method()V\n" % index) * 2048
+            archive.writestr(f"classes{index + 1}.dex", text + os.urandom(256 * 1024), zipfile.ZIP_DEFLATED)
+            archive.writestr(f"lib/arm64-v8a/lib{index}.so", os.urandom(2 * 1024 * 1024), zipfile.ZIP_STORED)
+            written += 2 * 1024 * 1024 + 256 * 1024 + len(text) // 8
+            index += 1
+    return path
+
+def _items(data: bytes) -> list[bytes]:
+    """Elements of a length-prefixed sequence"""
+    items = []
+    pos = 0
+    while pos < len(data):
+        length, = struct.unpack_from("<I", data, pos)
+        items.append(data[pos + 4:pos + 4 + length])
+        pos += 4 + length
+    return items
+
+def _field(data: bytes, pos: int) -> tuple[bytes, int]:
+    length, = struct.unpack_from("<I", data, pos)
+    return data[pos + 4:pos + 4 + length], pos + 4 + length
+
+def reference_digest(data: bytes, entries_end: int, cd_offset: int, eocd_offset: int, algorithm: str) -> bytes:
+    """Plain sequential content digest, independent of apksign.content_digest"""
+    eocd = bytearray(data[eocd_offset:])
+    struct.pack_into("<I", eocd, 16, entries_end)
+    chunks = []
+    for section in (data[:entries_end], data[cd_offset:eocd_offset], bytes(eocd)):
+        for start in range(0, len(section), apksign.CHUNK_SIZE):
+            chunk = section[start:start + apksign.CHUNK_SIZE]
+            chunks.append(hashlib.new(algorithm, b"\xa5" + struct.pack("<I", len(chunk)) + chunk).digest())
+    return hashlib.new(algorithm, b"\x5a" + struct.pack("<I", len(chunks)) + b"".join(chunks)).digest()
+
+def verify(apk: Path) -> list[str]:
+    """Problems found in the v2/v3 signatures of an APK, empty when both verify"""
+    data = apk.read_bytes()
+    entries_end, cd_offset, eocd_offset = apksign.find_sections(data)
+    if entries_end == cd_offset:
+        return ["no APK signing block"]
+
+    blocks = {}
+    pos = entries_end + 8
+    while pos < cd_offset - 24:
+        length, block_id = struct.unpack_from("<QI", data, pos)
+        blocks[block_id] = data[pos + 12:pos + 8 + length]
+        pos += 8 + length
+
+    problems = []
+    digests = {}
+    for scheme, block_id in (("v2", apksign.V2_BLOCK_ID), ("v3", apksign.V3_BLOCK_ID)):
+        if block_id not in blocks:
+            problems.append(f"{scheme} block missing")
+            continue
+        for signer in _items(_items(blocks[block_id])[0]):
+            signed_data, pos = _field(signer, 0)
+            if scheme == "v3":
+                pos += 8
+            signatures, pos = _field(signer, pos)
+            public_key_der, _ = _field(signer, pos)
+            public_key = serialization.load_der_public_key(public_key_der)
+
+            for signature in _items(signatures):
+                algorithm, = struct.unpack_from("<I", signature)
+                value, _ = _field(signature, 4)
+                digest = hashes.SHA256() if apksign.DIGESTS[algorithm] == "sha256" else hashes.SHA512()
+                try:
+                    if algorithm in (apksign.ECDSA_SHA256, apksign.ECDSA_SHA512):
+                        public_key.verify(value, signed_data, ec.ECDSA(digest))
+                    else:
+                        public_key.verify(value, signed_data, padding.PKCS1v15(), digest)
+                except Exception:
+                    problems.append(f"{scheme} signature does not verify")
+
+            digest_items, pos = _field(signed_data, 0)
+            certificates, _ = _field(signed_data, pos)
+            certificate = x509.load_der_x509_certificate(_items(certificates)[0])
+            if certificate.public_key().public_bytes(
+                serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+            ) != public_key_der:
+                problems.append(f"{scheme} certificate does not match the public key")
+
+            for item in _items(digest_items):
+                algorithm, = struct.unpack_from("<I", item)
+                expected, _ = _field(item, 4)
+                name = apksign.DIGESTS[algorithm]
+                if name not in digests:
+                    digests[name] = reference_digest(data, entries_end, cd_offset, eocd_offset, name)
+                if digests[name] != expected:
+                    problems.append(f"{scheme} content digest mismatch")
+    return problems
+
+def apksigner_verify(apksigner: str, apk: Path) -> tuple[bool, str]:
+    result = subprocess.run(
+        [apksigner, "verify", "--verbose", "--print-certs", "--min-sdk-version", MIN_SDK, str(apk)],
+        capture_output=True, text=True
+    )
+    output = result.stdout + result.stderr
+    ok = result.returncode == 0 and all(
+        f"Verified using {scheme} scheme (APK Signature Scheme {scheme}): true" in output
+        for scheme in ("v2", "v3")
+    )
+    return ok, output
+
+def cert_digest(output: str) -> str | None:
+    return next((line.split(":", 1)[1].strip() for line in output.splitlines()
+                 if "certificate SHA-256 digest" in line), None)
+
+def timed(call, rounds: int) -> float:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("apks", nargs="*", type=Path, help="APKs to sign (default: a synthetic one)")
+    parser.add_argument("--size-mb", type=int, default=100, help="size of the synthetic APK")
+    parser.add_argument("--rounds", type=int, default=3, help="runs per signer, the median is reported")
+    parser.add_argument("--apksigner", help="apksigner to compare with (default: the newest build-tools)")
+    options = parser.parse_args()
+
+    apksigner = options.apksigner or utils.find_apksigner()
+    failed = False
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        apks = options.apks or [make_apk(scratch / "synthetic.apk", options.size_mb)]
+        for apk in apks:
+            size_mb = apk.stat().st_size / 1024 / 1024
+            print(f"{apk.name} ({size_mb:.1f} MiB)")
+            ours = scratch / f"{apk.stem}-python.apk"
+            # Untimed run so both variants read the APK from the page cache
+            apksign.sign(apk, ours, KEYSTORE, PASSWORD)
+            serial = timed(lambda: apksign.sign(apk, ours, KEYSTORE, PASSWORD, workers=1), options.rounds)
+            threaded = timed(lambda: apksign.sign(apk, ours, KEYSTORE, PASSWORD), options.rounds)
+            print(f"  in-process, serial:      {serial:7.3f}s")
+            print(f"  in-process, {apksign.SIGNING_WORKERS:>2} workers:  {threaded:7.3f}s ({serial / threaded:.1f}x)")
+
+            problems = verify(ours)
+            print(f"  built-in verify:         {'ok' if not problems else '; '.join(problems)}")
+            failed = failed or bool(problems)
+
+            if not apksigner:
+                print("  apksigner not found, skipping the JVM comparison")
+                continue
+            theirs = scratch / f"{apk.stem}-apksigner.apk"
+            jvm_time = timed(lambda: subprocess.run([
+                apksigner, "sign", "--ks", KEYSTORE, "--ks-pass", f"pass:{PASSWORD}",
+                "--min-sdk-version", MIN_SDK, "--in", str(apk), "--out", str(theirs)
+            ], check=True, capture_output=True), options.rounds)
+            print(f"  apksigner:               {jvm_time:7.3f}s ({jvm_time / threaded:.1f}x slower)")
+
+            ok, output = apksigner_verify(apksigner, ours)
+            _, reference = apksigner_verify(apksigner, theirs)
+            same_cert = cert_digest(output) is not None and cert_digest(output) == cert_digest(reference)
+            print(f"  apksigner verify:        {'ok' if ok else 'FAILED'}, "
+                  f"certificate {'matches' if same_cert else 'DIFFERS from'} apksigner's")
+            if not ok:
+                print(output)
+            failed = failed or not ok or not same_cert
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Check r2.upload and r2.prune against an in-process S3 stand-in (moto).
+
+Usage: python benchmarks/check_r2.py
+
+Runs two publishing runs into one prefix. The first uploads three APKs. The
+second uploads two of them again with the same content and then prunes.
+Fails unless:
+  * the unchanged APKs are not uploaded again and are still stored
+  * the APK left out of the second run is pruned
+  * an APK with new content under a known key is uploaded
+Needs moto (pip install moto); skipped when it is not installed.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+BUCKET = "check-r2"
+os.environ.update({
+    "BUCKET_NAME": BUCKET,
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1"
+})
+os.environ.pop("ENDPOINT_URL", None)
+
+from src import r2  # noqa: E402
+
+def count_uploads() -> list[str]:
+    """Keys the shared client's upload_file is called with, in order"""
+    uploaded = []
+    s3 = r2.client()
+    upload_file = s3.upload_file
+
+    def counting(filename, bucket, key, **kwargs):
+        uploaded.append(key)
+        return upload_file(filename, bucket, key, **kwargs)
+
+    s3.upload_file = counting
+    return uploaded
+
+def new_run(uploaded: list[str]) -> None:
+    """Forget the previous run's listings and uploads"""
+    r2._listings.clear()
+    r2._kept.clear()
+    uploaded.clear()
+
+def stored(key: str) -> bool:
+    return "Contents" in r2.client().list_objects_v2(Bucket=BUCKET, Prefix=key)
+
+def main() -> int:
+    try:
+        from moto import mock_aws
+    except ImportError:
+        print("moto not installed, skipping the R2 check (pip install moto)")
+        return 0
+
+    problems = []
+    with mock_aws(), tempfile.TemporaryDirectory() as scratch:
+        r2._client = None
+        r2.client().create_bucket(Bucket=BUCKET)
+        uploaded = count_uploads()
+        files = {name: Path(scratch) / f"{name}.apk" for name in ("kept", "other", "dropped")}
+        for name, path in files.items():
+            path.write_bytes(name.encode() * 1024)
+
+        new_run(uploaded)
+        for name, path in files.items():
+            r2.upload(path, f"apps/{name}.apk")
+        r2.prune()
+        if len(uploaded) != len(files):
+            problems.append(f"first run uploaded {uploaded}")
+
+        # Everything from the first run is past the threshold now
+        new_run(uploaded)
+        for name in ("kept", "other"):
+            r2.upload(files[name], f"apps/{name}.apk")
+        r2.prune(threshold_minutes=0)
+        if uploaded:
+            problems.append(f"unchanged files uploaded again: {uploaded}")
+        for name in ("kept", "other"):
+            if not stored(f"apps/{name}.apk"):
+                problems.append(f"unchanged apps/{name}.apk was pruned")
+        if stored("apps/dropped.apk"):
+            problems.append("stale file was not pruned")
+
+        files["kept"].write_bytes(b"changed" * 1024)
+        new_run(uploaded)
+        r2.upload(files["kept"], "apps/kept.apk")
+        r2.prune(threshold_minutes=0)
+        if uploaded != ["apps/kept.apk"]:
+            problems.append(f"changed file not uploaded: {uploaded}")
+
+    for problem in problems:
+        print(problem)
+    print(f"r2 skip and prune: {'ok' if not problems else 'failed'}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Sign the fixture APKs in-process and check the result with apksigner verify.
+
+Usage: python benchmarks/check_signing.py [APK ...] [--apksigner PATH]
+
+Every APK in benchmarks/fixtures/signing (or the ones given) is signed with
+apksign.sign under each keystore: keystore/public.jks (RSA-2048, SHA-256
+digests) and fixtures/signing/rsa4096.p12 (RSA-4096, SHA-512 digests). Each
+result is checked by the built-in verifier of bench_signing.py and then by
+`apksigner verify --verbose --print-certs`, which reads the minSdk from the
+APK's own manifest. The apksigner step is skipped only when build-tools are
+not installed and --apksigner is not given; the certificate it reports must
+be the keystore's.
+"""
+import sys
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+FIXTURE_DIR = BENCH_DIR / "fixtures" / "signing"
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from src import apksign, utils  # noqa: E402
+from bench_signing import KEYSTORE, PASSWORD, verify, cert_digest  # noqa: E402
+
+# Both keystores use PASSWORD
+KEYSTORES = [KEYSTORE, str(FIXTURE_DIR / "rsa4096.p12")]
+
+def apksigner_verify(apksigner: str, apk: Path, keystore: str) -> list[str]:
+    """Problems apksigner reports for an APK, empty when v2 and v3 verify with our certificate"""
+    result = subprocess.run([apksigner, "verify", "--verbose", "--print-certs", str(apk)], capture_output=True, text=True)
+    output = result.stdout + result.stderr
+    problems = []
+    if result.returncode != 0:
+        problems.append(f"apksigner exited with {result.returncode}:\n{output}")
+    for scheme in ("v2", "v3"):
+        if f"Verified using {scheme} scheme (APK Signature Scheme {scheme}): true" not in output:
+            problems.append(f"apksigner did not verify the {scheme} signature")
+    expected = hashlib.sha256(apksign.load_signer(keystore, PASSWORD).certificate).hexdigest()
+    if cert_digest(output) != expected:
+        problems.append(f"apksigner reports certificate {cert_digest(output)}, expected {expected}")
+    return problems
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("apks", nargs="*", type=Path, help="APKs to sign (default: the fixtures)")
+    parser.add_argument("--apksigner", help="apksigner to verify with (default: the newest build-tools)")
+    options = parser.parse_args()
+
+    apks = options.apks or sorted(FIXTURE_DIR.glob("*.apk"))
+    if not apks:
+        print(f"No APKs in {FIXTURE_DIR}")
+        return 1
+
+    apksigner = options.apksigner or utils.find_apksigner()
+    failed = False
+    with tempfile.TemporaryDirectory() as scratch:
+        for apk in apks:
+            if not apksign.can_sign(apk):
+                print(f"{apk.name}: needs a v1 signature, not signed in-process")
+                failed = True
+                continue
+            for keystore in KEYSTORES:
+                label = f"{apk.name} with {Path(keystore).name}"
+                signed = Path(scratch) / f"{apk.stem}-{Path(keystore).stem}.apk"
+                apksign.sign(apk, signed, keystore, PASSWORD)
+
+                problems = verify(signed)
+                print(f"{label}: built-in verify {'ok' if not problems else '; '.join(problems)}")
+                failed = failed or bool(problems)
+
+                if not apksigner:
+                    print(f"{label}: apksigner verify skipped, apksigner not found")
+                    continue
+                problems = apksigner_verify(apksigner, signed, keystore)
+                print(f"{label}: apksigner verify {'ok' if not problems else '; '.join(problems)}")
+                failed = failed or bool(problems)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Download from a local range-capable server under a per-host limit of 1.
+
+Usage: python benchmarks/check_transfer.py [--size-mb N] [--timeout S]
+
+Runs transfer.download once over ranged connections and once as a single
+stream, with limits.configure({'*': BoundedSemaphore(1)}) as fleet installs
+for --host-limit <host>=1. Fails when a download does not finish within
+--timeout (the ranged workers deadlocking on the host slot) or the file
+does not match what was served.
+"""
+import os
+import sys
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from src import limits, transfer  # noqa: E402
+
+def serve(body: bytes) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            start, end = 0, len(body) - 1
+            ranged = self.headers.get("Range", "").startswith("bytes=")
+            if ranged:
+                first, _, last = self.headers["Range"][6:].partition("-")
+                start, end = int(first), int(last) if last else len(body) - 1
+            self.send_response(206 if ranged else 200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            if ranged:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+            self.end_headers()
+            self.wfile.write(body[start:end + 1])
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # download() closes the probe response before reading its body
+            pass
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run(url: str, dest: Path, sha256: str, timeout: float) -> str | None:
+    """Problem with the download, None when it finished and matches"""
+    errors = []
+
+    def target():
+        try:
+            transfer.download(url, name=str(dest), sha256=sha256)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return f"still running after {timeout:.0f}s, deadlocked on the host slot"
+    if errors:
+        return f"failed: {errors[0]}"
+    return None
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=4, help="size of the served file")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds before a download counts as stuck")
+    options = parser.parse_args()
+
+    body = os.urandom(options.size_mb * 1024 * 1024)
+    sha256 = hashlib.sha256(body).hexdigest()
+    # Small segments so several workers compete for the single slot
+    transfer.RANGED_MIN_SIZE = 1024 * 1024
+    transfer.SEGMENT_SIZE = 256 * 1024
+    transfer.RETRIES = 1
+    limits.configure({"*": threading.BoundedSemaphore(1)})
+
+    server = serve(body)
+    url = f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+    failed = False
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            for mode, connections in (("ranged", max(transfer.CONNECTIONS, 2)), ("stream", 1)):
+                transfer.CONNECTIONS = connections
+                problem = run(url, Path(scratch) / f"{mode}.bin", sha256, options.timeout)
+                print(f"{mode:<7} host limit 1, {connections} connections: {problem or 'ok'}")
+                failed = failed or bool(problem)
+    finally:
+        server.shutdown()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
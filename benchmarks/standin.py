@@ -0,0 +1,113 @@
+"""Local HTTP stand-in for the mirrors, serving recorded responses from a fixture directory.
+
+routes.json in the fixture directory maps full request URLs (method-prefixed
+for anything but GET) to a fixture file, status code and content type.
+install() mounts an adapter on the scraping sessions that sends every
+https request to the stand-in instead of the real host.
+"""
+import json
+import threading
+from pathlib import Path
+from urllib.parse import quote, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests.adapters import HTTPAdapter
+
+class Stats:
+    """Requests served and bytes sent, reset between measured calls"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+            self.misses = []
+
+    def add(self, sent: int, url: str = None) -> None:
+        with self.lock:
+            self.requests += 1
+            self.bytes += sent
+            if url:
+                self.misses.append(url)
+
+def _route_key(method: str, url: str) -> str:
+    return url if method in ("GET", "HEAD") else f"{method} {url}"
+
+class StandIn:
+    def __init__(self, fixture_dir: Path):
+        self.fixture_dir = Path(fixture_dir)
+        self.routes = json.loads((self.fixture_dir / "routes.json").read_text())
+        self.bodies = {}
+        for route in self.routes.values():
+            if "file" in route and route["file"] not in self.bodies:
+                self.bodies[route["file"]] = (self.fixture_dir / route["file"]).read_bytes()
+        self.stats = Stats()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes, Nagle would hold the body back ~40ms
+            disable_nagle_algorithm = True
+
+            def _serve(self, body_wanted: bool) -> None:
+                # The original URL travels in the path, see ForwardingAdapter
+                url = unquote(self.path.lstrip("/"))
+                route = standin.routes.get(_route_key(self.command, url))
+                if route is None:
+                    body, status, content_type = b"not recorded", 404, "text/plain"
+                else:
+                    body = standin.bodies.get(route.get("file"), b"")
+                    status, content_type = route.get("status", 200), route.get("content_type", "text/html")
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body_wanted:
+                    self.wfile.write(body)
+                standin.stats.add(len(body) if body_wanted else 0, None if route else url)
+
+            def do_GET(self):
+                self._serve(True)
+
+            def do_HEAD(self):
+                self._serve(False)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class ForwardingAdapter(HTTPAdapter):
+    """Send every request to the stand-in, keeping the original URL in the path"""
+    def __init__(self, origin: str):
+        super().__init__()
+        self.origin = origin
+
+    def send(self, request, **kwargs):
+        request.url = f"{self.origin}/{quote(request.url, safe='')}"
+        return super().send(request, **kwargs)
+
+def install(origin: str, *sessions) -> None:
+    adapter = ForwardingAdapter(origin)
+    for session in sessions:
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
@@ -3,6 +3,7 @@ import logging
 import random
 import requests
 from github import Github
+from src import limits, trace
 
 # --- Auto Generate User-Agent ---
 os_platforms = {
@@ -58,7 +59,14 @@ def generate_user_agent():
     return template.format(platform=platform, ver=version)
 
 # --- Requests Session with Random User-Agent ---
-session = requests.Session()
+class LimitedSession(requests.Session):
+    """Session that respects the per-host limits of a fleet build"""
+    def request(self, method, url, *args, **kwargs):
+        with limits.host_slot(url):
+            return super().request(method, url, *args, **kwargs)
+
+session = LimitedSession()
+session.hooks["response"].append(trace.count_response)
 session.headers.update({
     'User-Agent': generate_user_agent()
 })
@@ -78,6 +86,13 @@ access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
 secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
 bucket_name = os.getenv('BUCKET_NAME')
 
+# Persistent cache shared between builds and runs
+cache_dir = os.getenv('CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'revanced-auto-builds'))
+cache_size_limit = int(os.getenv('CACHE_SIZE_MB', '4096')) * 1024 * 1024
+
+# APKEditor merges split bundles, pinned so it is resolved from cache
+apkeditor_tag = os.getenv('APKEDITOR_TAG', 'V1.4.3')
+
 # APKmirror base url
 base_url = "https://www.apkmirror.com"
 gh = Github(github_token) if github_token else Github()
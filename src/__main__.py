@@ -1,18 +1,70 @@
 import json
+import shutil
 import logging
-from sys import exit
+from sys import exit, argv
 from pathlib import Path
 from os import getenv
 import subprocess
 from src import (
     r2,
+    jvm,
     utils,
+    apkzip,
+    apksign,
+    limits,
+    trace,
     release,
+    splits,
+    manifest,
     downloader
 )
 
-def run_build(app_name: str, source: str, arch: str = "universal") -> str:
-    """Build APK for specific architecture"""
+# Native-lib folders we know how to strip, and what each build arch keeps
+ARCH_ABIS = {
+    "arm64-v8a": ["arm64-v8a"],
+    "armeabi-v7a": ["armeabi-v7a"],
+    "universal": ["arm64-v8a", "armeabi-v7a"]
+}
+STRIPPABLE_ABIS = ["x86", "x86_64", "arm64-v8a", "armeabi-v7a"]
+
+KEYSTORE = "keystore/public.jks"
+KEYSTORE_PASSWORD = "public"
+KEY_ALIAS = "public"
+
+def strip_abis(apk: Path, keep_abis: list[str]) -> None:
+    """Delete every strippable lib/<abi>/ folder that is not in keep_abis"""
+    remove = [f"lib/{abi}/*" for abi in STRIPPABLE_ABIS if abi not in keep_abis]
+    if not remove:
+        return
+
+    utils.run_process([
+        "zip", "--delete", str(apk), *remove
+    ], silent=True, check=False)
+
+def filter_apk(source_apk: Path, dest_apk: Path, keep_abis: list[str]) -> None:
+    """Strip unneeded native libs and old signatures, and repair the archive if needed, in a single pass"""
+    removed = tuple(f"lib/{abi}/" for abi in STRIPPABLE_ABIS if abi not in keep_abis)
+    tmp_apk = dest_apk.with_name(dest_apk.name + ".tmp")
+
+    def keep(name: str) -> bool:
+        return not name.startswith(removed) and not apkzip.is_signature_file(name)
+
+    try:
+        if apkzip.rewrite(source_apk, tmp_apk, keep=keep):
+            logging.info("APK fixed successfully")
+        tmp_apk.replace(dest_apk)
+    except Exception as e:
+        # Fall back to the external zip tools, e.g. for Zip64 archives
+        logging.warning(f"In-process rewrite failed, falling back to zip: {e}")
+        tmp_apk.unlink(missing_ok=True)
+        if source_apk != dest_apk:
+            shutil.copyfile(source_apk, dest_apk)
+        strip_abis(dest_apk, keep_abis)
+        with trace.span("repair", apk=dest_apk.name):
+            repair_apk(dest_apk)
+
+def prepare_tools(source: str) -> tuple[Path, Path, str, bool] | None:
+    """Download CLI and patches for a source, returns (cli, patches, name, is_morphe)"""
     download_files, name = downloader.download_required(source)
 
     # Log downloaded files for debugging
@@ -84,70 +136,44 @@ def run_build(app_name: str, source: str, arch: str = "universal") -> str:
     logging.info(f"✅ Using CLI: {cli.name}")
     logging.info(f"✅ Using patches: {patches.name}")
 
-    download_methods = [
-        downloader.download_apkmirror,
-        downloader.download_apkpure,
-        downloader.download_uptodown,
-        downloader.download_aptoide
-    ]
+    return cli, patches, name, is_morphe
 
+def prepare_input(app_name: str, cli: Path, patches: Path) -> tuple[Path | None, str | None, str | None]:
+    """Download the stock APK and merge it into a single .apk if needed; also returns the mirror it came from"""
+    # Race the mirrors for a link, and retry without a mirror whose download fails
     input_apk = None
     version = None
-    for method in download_methods:
-        input_apk, version = method(app_name, str(cli), str(patches))
-        if input_apk:
+    failed_platforms = []
+    while input_apk is None:
+        with trace.span("resolve_version", excluded=list(failed_platforms)) as attrs:
+            platform, link, version = downloader.resolve_download(
+                app_name, str(cli), str(patches), exclude=failed_platforms
+            )
+            attrs.update(platform=platform, version=version)
+        if not link:
             break
+        try:
+            with trace.span("apk_download", platform=platform):
+                input_apk = downloader.download_resource(link)
+        except Exception as e:
+            logging.error(f"Download from {platform} failed: {e}")
+            failed_platforms.append(platform)
             
     if input_apk is None:
         logging.error(f"❌ Failed to download APK for {app_name}")
         logging.error("All download sources failed. Skipping this app.")
-        return None
+        return None, None, None
 
     if input_apk.suffix != ".apk":
-        logging.warning("Input file is not .apk, using APKEditor to merge")
-        apk_editor = downloader.download_apkeditor()
-
-        merged_apk = input_apk.with_suffix(".apk")
-
-        utils.run_process([
-            "java", "-jar", apk_editor, "m",
-            "-i", str(input_apk),
-            "-o", str(merged_apk)
-        ], silent=True)
-
+        logging.info(f"Input file is a split bundle, merging {input_apk.name}")
+        merged_apk = splits.merge(input_apk)
         input_apk.unlink(missing_ok=True)
-
-        if not merged_apk.exists():
-            logging.error("Merged APK file not found")
-            exit(1)
-
         input_apk = merged_apk
         logging.info(f"Merged APK file generated: {input_apk}")
 
-    # ARCHITECTURE-SPECIFIC PROCESSING
-    if arch != "universal":
-        logging.info(f"Processing APK for {arch} architecture...")
-        
-        # Remove unwanted architectures based on selected arch
-        if arch == "arm64-v8a":
-            # Remove x86, x86_64, and armeabi-v7a
-            utils.run_process([
-                "zip", "--delete", str(input_apk), 
-                "lib/x86/*", "lib/x86_64/*", "lib/armeabi-v7a/*"
-            ], silent=True, check=False)
-        elif arch == "armeabi-v7a":
-            # Remove x86, x86_64, and arm64-v8a
-            utils.run_process([
-                "zip", "--delete", str(input_apk),
-                "lib/x86/*", "lib/x86_64/*", "lib/arm64-v8a/*"
-            ], silent=True, check=False)
-    else:
-        # Universal: only remove x86 architectures
-        utils.run_process([
-            "zip", "--delete", str(input_apk), 
-            "lib/x86/*", "lib/x86_64/*"
-        ], silent=True, check=False)
+    return input_apk, version, platform
 
+def read_patch_selection(app_name: str, source: str) -> tuple[list[str], list[str]]:
     exclude_patches = []
     include_patches = []
 
@@ -161,10 +187,13 @@ def run_build(app_name: str, source: str, arch: str = "universal") -> str:
                 elif line.startswith('+'):
                     include_patches.extend(["-e", line[1:].strip()])
 
+    return exclude_patches, include_patches
+
+def repair_apk(input_apk: Path) -> None:
     # FIX: Repair corrupted APK from Uptodown
     logging.info("Checking APK for corruption...")
     try:
-        fixed_apk = Path(f"{app_name}-fixed-v{version}.apk")
+        fixed_apk = input_apk.with_name(f"{input_apk.stem}-fixed.apk")
         subprocess.run([
             "zip", "-FF", str(input_apk), "--out", str(fixed_apk)
         ], check=False, capture_output=True)
@@ -176,9 +205,8 @@ def run_build(app_name: str, source: str, arch: str = "universal") -> str:
     except Exception as e:
         logging.warning(f"Could not fix APK: {e}")
 
-    # Include architecture in output filename
-    output_apk = Path(f"{app_name}-{arch}-patch-v{version}.apk")
-
+def patch_apk(cli: Path, patches: Path, input_apk: Path, output_apk: Path, is_morphe: bool,
+              exclude_patches: list[str], include_patches: list[str]) -> None:
     # USE DIFFERENT COMMANDS BASED ON SOURCE TYPE
     if is_morphe:
         logging.info("🔧 Using Morphe patching system...")
@@ -186,71 +214,158 @@ def run_build(app_name: str, source: str, arch: str = "universal") -> str:
         # Try common patterns
         try:
             # Try ReVanced-style arguments first (most likely)
-            morphe_cmd = [
-                "java", "-jar", str(cli),
+            morphe_args = [
                 "patch", "--patches", str(patches),
                 "--out", str(output_apk), str(input_apk),
                 *exclude_patches, *include_patches
             ]
-            utils.run_process(morphe_cmd, stream=True)
+            jvm.run(cli, morphe_args, probe=["--help"], stream=True)
         except subprocess.CalledProcessError:
             # Try alternative Morphe arguments
             logging.info("Trying alternative Morphe command format...")
-            morphe_cmd = [
-                "java", "-jar", str(cli),
+            morphe_args = [
                 "--patches", str(patches),
                 "--input", str(input_apk),
                 "--output", str(output_apk)
             ]
-            utils.run_process(morphe_cmd, stream=True)
+            jvm.run(cli, morphe_args, probe=["--help"], stream=True)
     else:
         logging.info("🔧 Using ReVanced patching system...")
         # Standard ReVanced command
-        utils.run_process([
-            "java", "-jar", str(cli),
+        jvm.run(cli, [
             "patch", "--patches", str(patches),
             "--out", str(output_apk), str(input_apk),
             *exclude_patches, *include_patches
-        ], stream=True)
-
-    input_apk.unlink(missing_ok=True)
+        ], probe=["--help"], stream=True)
 
-    # Include architecture in final signed APK name
-    signed_apk = Path(f"{app_name}-{arch}-{name}-v{version}.apk")
+def sign_apk(output_apk: Path, signed_apk: Path) -> None:
+    # With APK_SIGNER=python, v2/v3 in-process when the APK does not need a v1 signature
+    try:
+        if apksign.ENABLED and apksign.can_sign(output_apk):
+            apksign.sign(output_apk, signed_apk, KEYSTORE, KEYSTORE_PASSWORD)
+            return
+    except Exception as e:
+        logging.warning(f"In-process signing failed, falling back to apksigner: {e}")
 
     apksigner = utils.find_apksigner()
     if not apksigner:
         exit(1)
 
+    # Run the jar directly when possible so it gets a CDS archive too
+    apksigner_jar = utils.find_apksigner_jar(apksigner)
+
+    def run_apksigner(args: list[str]) -> None:
+        if apksigner_jar:
+            jvm.run(apksigner_jar, args, probe=["version"], stream=True)
+        else:
+            utils.run_process([str(apksigner), *args], stream=True)
+
     try:
-        utils.run_process([
-            str(apksigner), "sign", "--verbose",
-            "--ks", "keystore/public.jks",
-            "--ks-pass", "pass:public",
-            "--key-pass", "pass:public",
-            "--ks-key-alias", "public",
+        run_apksigner([
+            "sign", "--verbose",
+            "--ks", KEYSTORE,
+            "--ks-pass", f"pass:{KEYSTORE_PASSWORD}",
+            "--key-pass", f"pass:{KEYSTORE_PASSWORD}",
+            "--ks-key-alias", KEY_ALIAS,
             "--in", str(output_apk), "--out", str(signed_apk)
-        ], stream=True)
+        ])
     except Exception as e:
         logging.warning(f"Standard signing failed: {e}")
         logging.info("Trying alternative signing method...")
         
-        utils.run_process([
-            str(apksigner), "sign", "--verbose",
+        run_apksigner([
+            "sign", "--verbose",
             "--min-sdk-version", "21",
-            "--ks", "keystore/public.jks",
-            "--ks-pass", "pass:public",
-            "--key-pass", "pass:public",
-            "--ks-key-alias", "public",
+            "--ks", KEYSTORE,
+            "--ks-pass", f"pass:{KEYSTORE_PASSWORD}",
+            "--key-pass", f"pass:{KEYSTORE_PASSWORD}",
+            "--ks-key-alias", KEY_ALIAS,
             "--in", str(output_apk), "--out", str(signed_apk)
-        ], stream=True)
+        ])
+
+def run_multi_arch_build(app_name: str, source: str, arches: list[str]) -> list[str]:
+    """Download and patch once, then derive every requested arch from the patched APK"""
+    trace.reset()
+    try:
+        with trace.span("build", app=app_name, source=source, arches=arches):
+            return _build_arches(app_name, source, arches)
+    finally:
+        trace.save(f"{app_name}-{source}")
+
+def _build_arches(app_name: str, source: str, arches: list[str]) -> list[str]:
+    with trace.span("tools"):
+        tools = prepare_tools(source)
+    if not tools:
+        return []
+    cli, patches, name, is_morphe = tools
+
+    with trace.span("input"):
+        input_apk, version, platform = prepare_input(app_name, cli, patches)
+    if input_apk is None:
+        return []
+    stock_sha256 = utils.file_sha256(input_apk)
+    tracks_latest = manifest.follows_latest(app_name, str(cli), str(patches))
+
+    # Keep only the ABIs some requested arch still needs, so the patcher
+    # works on the smallest possible input
+    wanted_abis = sorted({abi for arch in arches for abi in ARCH_ABIS.get(arch, ARCH_ABIS["universal"])})
+    logging.info(f"Stripping input APK down to {', '.join(wanted_abis)}...")
+    with trace.span("strip", abis=wanted_abis):
+        filter_apk(input_apk, input_apk, wanted_abis)
+
+    exclude_patches, include_patches = read_patch_selection(app_name, source)
+
+    patched_apk = Path(f"{app_name}-patch-v{version}.apk")
+    with limits.jvm_slot(), trace.span("patch", version=version):
+        patch_apk(cli, patches, input_apk, patched_apk, is_morphe, exclude_patches, include_patches)
+    input_apk.unlink(missing_ok=True)
 
-    output_apk.unlink(missing_ok=True)
-    print(f"✅ APK built: {signed_apk.name}")
-    
-    return str(signed_apk)
+    built_apks = []
+    for arch in arches:
+        logging.info(f"Processing APK for {arch} architecture...")
+
+        # Include architecture in output filename
+        output_apk = Path(f"{app_name}-{arch}-patch-v{version}.apk")
+        with trace.span("filter", arch=arch):
+            filter_apk(patched_apk, output_apk, ARCH_ABIS.get(arch, ARCH_ABIS["universal"]))
+
+        # Include architecture in final signed APK name
+        signed_apk = Path(f"{app_name}-{arch}-{name}-v{version}.apk")
+        with trace.span("sign", arch=arch):
+            sign_apk(output_apk, signed_apk)
+
+        output_apk.unlink(missing_ok=True)
+        print(f"✅ APK built: {signed_apk.name}")
+        built_apks.append(str(signed_apk))
+        manifest.record(app_name, source, arch, signed_apk, cli, patches, version, stock_sha256, tracks_latest, platform)
+
+    patched_apk.unlink(missing_ok=True)
+    return built_apks
+
+def run_build(app_name: str, source: str, arch: str = "universal") -> str:
+    """Build APK for specific architecture"""
+    built_apks = run_multi_arch_build(app_name, source, [arch])
+    return built_apks[0] if built_apks else None
+
+def get_arches(app_name: str, source: str, arch_config: list) -> list[str]:
+    for config in arch_config:
+        if config["app_name"] == app_name and config["source"] == source:
+            return config["arches"]
+    return ["universal"]  # default
 
 def main():
+    if len(argv) > 1 and argv[1] == "build-all":
+        from src import fleet
+        fleet.main(argv[2:])
+        return
+    if len(argv) > 1 and argv[1] == "resolve-releases":
+        from src import github_api
+        github_api.main(argv[2:])
+        return
+    if len(argv) > 1 and argv[1] == "plan":
+        manifest.main(argv[2:])
+        return
+
     app_name = getenv("APP_NAME")
     source = getenv("SOURCE")
 
@@ -264,26 +379,20 @@ def main():
         with open(arch_config_path) as f:
             arch_config = json.load(f)
         
-        # Find arches for this app
-        arches = ["universal"]  # default
-        for config in arch_config:
-            if config["app_name"] == app_name and config["source"] == source:
-                arches = config["arches"]
-                break
+        # Find arches for this app, ARCH narrows it down, e.g. to the stale ones of an incremental build
+        arches = get_arches(app_name, source, arch_config)
+        if getenv("ARCH"):
+            arches = getenv("ARCH").split(",")
         
-        # Build for each architecture
-        built_apks = []
-        for arch in arches:
-            logging.info(f"🔨 Building {app_name} for {arch} architecture...")
-            apk_path = run_build(app_name, source, arch)
-            if apk_path:
-                built_apks.append(apk_path)
-                print(f"✅ Built {arch} version: {Path(apk_path).name}")
+        # Download and patch once, then build every architecture from it
+        logging.info(f"🔨 Building {app_name} for {', '.join(arches)} architecture(s)...")
+        built_apks = run_multi_arch_build(app_name, source, arches)
         
         # Summary
         print(f"\n🎯 Built {len(built_apks)} APK(s) for {app_name}:")
         for apk in built_apks:
             print(f"  📱 {Path(apk).name}")
+        jvm.report()
         
     else:
         # Fallback to single universal build
@@ -1,9 +1,6 @@
 import re
 import logging
-import time
-import random
-import cloudscraper
-from bs4 import BeautifulSoup
+from src import pages, markup, scrapers
 
 # Base URL for APKMirror
 APKMIRROR_BASE = "https://www.apkmirror.com"
@@ -12,19 +9,17 @@ APKMIRROR_BASE = "https://www.apkmirror.com"
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
 def get_download_link(version: str, app_name: str, config: dict, arch: str = None) -> str:
-    scraper = cloudscraper.create_scraper()
+    scraper = scrapers.get(APKMIRROR_BASE)
     target_arch = arch if arch else config.get('arch', 'universal')
 
     # Step 1: Find release page via uploads search (new approach from project)
     uploads_url = f"{APKMIRROR_BASE}/uploads/?appcategory={app_name}"
     logging.info(f"Searching uploads for version {version}")
-    time.sleep(2 + random.random())
-    response = scraper.get(uploads_url)
-    response.encoding = 'utf-8'
-    if response.status_code != 200:
-        logging.error(f"Uploads page failed: {response.status_code}")
+    html = pages.fetch(scraper, uploads_url)
+    if html is None:
+        logging.error("Uploads page failed")
         return None
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = markup.parse(html, markup.APKMIRROR_APP_ROWS)
 
     release_url = None
     for row in soup.find_all("div", class_="appRow"):
@@ -40,13 +35,11 @@ def get_download_link(version: str, app_name: str, config: dict, arch: str = Non
         return None
 
     # Step 2: Load release page and find variant for arch
-    time.sleep(2 + random.random())
-    response = scraper.get(release_url)
-    response.encoding = 'utf-8'
-    if response.status_code != 200:
-        logging.error(f"Release page failed: {response.status_code}")
+    html = pages.fetch(scraper, release_url)
+    if html is None:
+        logging.error("Release page failed")
         return None
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = markup.parse(html, markup.LINKS)
 
     variant_url = None
     for a in soup.find_all("a", href=True):
@@ -61,13 +54,12 @@ def get_download_link(version: str, app_name: str, config: dict, arch: str = Non
         return None
 
     # Step 3: Load variant page and extract final link with key
-    time.sleep(2 + random.random())
-    response = scraper.get(variant_url)
-    response.encoding = 'utf-8'
-    if response.status_code != 200:
-        logging.error(f"Variant page failed: {response.status_code}")
+    # The key in the link may expire, so always revalidate across runs
+    html = pages.fetch(scraper, variant_url, ttl=0)
+    if html is None:
+        logging.error("Variant page failed")
         return None
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = markup.parse(html, markup.LINKS)
 
     final_url = None
     for a in soup.find_all("a", href=True):
@@ -91,15 +83,13 @@ def get_architecture_criteria(arch: str) -> dict:
     return arch_mapping.get(arch, "universal")
 
 def get_latest_version(app_name: str, config: dict) -> str:
-    scraper = cloudscraper.create_scraper()
+    scraper = scrapers.get(APKMIRROR_BASE)
     url = f"{APKMIRROR_BASE}/uploads/?appcategory={config['name']}"
-    time.sleep(2 + random.random())
-    response = scraper.get(url)
-    response.encoding = 'utf-8'
-    if response.status_code != 200:
-        logging.error(f"Latest version URL failed: {response.status_code}")
+    html = pages.fetch(scraper, url)
+    if html is None:
+        logging.error("Latest version URL failed")
         return None
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = markup.parse(html, markup.APKMIRROR_APP_ROWS)
     app_rows = soup.find_all("div", class_="appRow")
     version_pattern = re.compile(r'\d+(\.\d+)+')
     for row in app_rows:
@@ -1,8 +1,7 @@
 import json
 import logging 
 
-from src import session 
-from bs4 import BeautifulSoup
+from src import session, markup
 
 # Define a standard browser User-Agent to avoid 403 Forbidden errors
 HEADERS = {
@@ -22,7 +21,7 @@ def get_latest_version(app_name: str, config: str) -> str:
         content_size = len(response.content)
         logging.info(f"URL:{response.url} [{content_size}/{content_size}] -> \"-\" [1]")
         
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = markup.parse(response.content, markup.APKPURE_VERSION)
         version_info = soup.find('div', class_='ver-top-down')
 
         if version_info and 'data-dt-version' in version_info.attrs:
@@ -44,7 +43,7 @@ def get_download_link(version: str, app_name: str, config: str) -> str:
         content_size = len(response.content)
         logging.info(f"URL:{response.url} [{content_size}/{content_size}] -> \"-\" [1]")
         
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = markup.parse(response.content, markup.APKPURE_DOWNLOAD_LINK)
         
         # Look for the download link; APKPure sometimes uses 'download_link' or 'fast-download'
         download_link = soup.find('a', id='download_link')
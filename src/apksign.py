@@ -0,0 +1,206 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import zipfile
+import functools
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from src import axml, trace
+
+# Signing needs cryptography; without it every APK goes through apksigner
+try:
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+except ImportError:
+    pkcs12 = None
+
+# APK Signature Scheme v2/v3 (https://source.android.com/docs/security/features/apksigning/v2)
+CHUNK_SIZE = 1024 * 1024
+SIGNING_WORKERS = int(os.getenv("SIGNING_WORKERS", str(os.cpu_count() or 1)))
+
+# apksigner stays the default; APK_SIGNER=python opts into signing in-process
+# (benchmarks/check_signing.py runs apksigner verify on its output)
+ENABLED = os.getenv("APK_SIGNER", "apksigner") == "python"
+
+BLOCK_MAGIC = b"APK Sig Block 42"
+V2_BLOCK_ID = 0x7109871A
+V3_BLOCK_ID = 0xF05368C0
+# Tells v2 verifiers that a v3 signature must be present too
+STRIPPING_PROTECTION_ID = 0xBEEFF00D
+V3_SCHEME = 3
+
+# Android only verifies v2/v3 from API 24 on; older targets still need v1 (JAR) signing
+MIN_SDK_WITHOUT_V1 = 24
+V3_MIN_SDK = 28
+V3_MAX_SDK = 0x7FFFFFFF
+
+EOCD = struct.Struct("<4sHHHHIIH")
+EOCD_SIG = b"PK\x05\x06"
+
+# Signature algorithm ids, with the content digest each one uses
+RSA_PKCS1_SHA256 = 0x0103
+RSA_PKCS1_SHA512 = 0x0104
+ECDSA_SHA256 = 0x0201
+ECDSA_SHA512 = 0x0202
+DIGESTS = {
+    RSA_PKCS1_SHA256: "sha256",
+    RSA_PKCS1_SHA512: "sha512",
+    ECDSA_SHA256: "sha256",
+    ECDSA_SHA512: "sha512"
+}
+
+class Signer:
+    """Private key and certificate of a PKCS#12 keystore"""
+    def __init__(self, keystore: Path, password: str):
+        key, certificate, _ = pkcs12.load_key_and_certificates(Path(keystore).read_bytes(), password.encode())
+        if key is None or certificate is None:
+            raise ValueError(f"{keystore} holds no private key and certificate")
+        self.key = key
+        self.certificate = certificate.public_bytes(serialization.Encoding.DER)
+        self.public_key = key.public_key().public_bytes(
+            serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+        # Same choice as apksigner: SHA-512 only for keys too large for SHA-256 to match
+        if isinstance(key, rsa.RSAPrivateKey):
+            self.algorithm = RSA_PKCS1_SHA256 if key.key_size <= 3072 else RSA_PKCS1_SHA512
+        elif isinstance(key, ec.EllipticCurvePrivateKey):
+            self.algorithm = ECDSA_SHA256 if key.key_size <= 256 else ECDSA_SHA512
+        else:
+            raise ValueError(f"unsupported key type {type(key).__name__}")
+
+    def sign(self, data: bytes) -> bytes:
+        digest = hashes.SHA256() if DIGESTS[self.algorithm] == "sha256" else hashes.SHA512()
+        if self.algorithm in (RSA_PKCS1_SHA256, RSA_PKCS1_SHA512):
+            return self.key.sign(data, padding.PKCS1v15(), digest)
+        return self.key.sign(data, ec.ECDSA(digest))
+
+@functools.lru_cache(maxsize=None)
+def load_signer(keystore: str, password: str) -> Signer:
+    return Signer(Path(keystore), password)
+
+def _prefixed(data: bytes) -> bytes:
+    return struct.pack("<I", len(data)) + data
+
+def _sequence(items: list[bytes]) -> bytes:
+    return _prefixed(b"".join(_prefixed(item) for item in items))
+
+def find_sections(buffer) -> tuple[int, int, int]:
+    """(end of the entries, central directory offset, EOCD offset) of an APK"""
+    # The EOCD comment is at most 64 KiB, search backwards from the end
+    start = max(0, len(buffer) - EOCD.size - 0xFFFF)
+    eocd_offset = buffer.rfind(EOCD_SIG, start)
+    if eocd_offset == -1:
+        raise ValueError("no end of central directory record")
+    *_, cd_size, cd_offset, _ = EOCD.unpack_from(buffer, eocd_offset)
+    if cd_offset == 0xFFFFFFFF or cd_offset + cd_size != eocd_offset:
+        raise ValueError("Zip64 or data between the central directory and its end record")
+
+    # An existing signing block sits right before the central directory and is replaced
+    entries_end = cd_offset
+    if cd_offset >= 32 and buffer[cd_offset - 16:cd_offset] == BLOCK_MAGIC:
+        block_size, = struct.unpack_from("<Q", buffer, cd_offset - 24)
+        entries_end = cd_offset - block_size - 8
+        if entries_end < 0 or struct.unpack_from("<Q", buffer, entries_end)[0] != block_size:
+            raise ValueError("damaged APK signing block")
+    return entries_end, cd_offset, eocd_offset
+
+def _chunk_digest(view, start: int, end: int, algorithm: str) -> bytes:
+    # hashlib releases the GIL on large buffers, so threads hash chunks in parallel
+    digest = hashlib.new(algorithm, b"\xa5" + struct.pack("<I", end - start))
+    digest.update(view[start:end])
+    return digest.digest()
+
+def content_digest(buffer, entries_end: int, cd_offset: int, eocd_offset: int, algorithm: str,
+                   workers: int = SIGNING_WORKERS) -> bytes:
+    """v2/v3 digest of the entries, central directory and EOCD, each hashed in 1 MiB chunks"""
+    # The EOCD is digested as if the central directory started right after the entries
+    eocd = bytearray(buffer[eocd_offset:])
+    struct.pack_into("<I", eocd, 16, entries_end)
+
+    with memoryview(buffer) as view:
+        chunks = []
+        for source, start, end in ((view, 0, entries_end), (view, cd_offset, eocd_offset), (memoryview(eocd), 0, len(eocd))):
+            chunks += [(source, offset, min(offset + CHUNK_SIZE, end)) for offset in range(start, end, CHUNK_SIZE)]
+
+        if workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = list(pool.map(lambda chunk: _chunk_digest(*chunk, algorithm), chunks))
+        else:
+            digests = [_chunk_digest(*chunk, algorithm) for chunk in chunks]
+        del chunks
+
+    top = hashlib.new(algorithm, b"\x5a" + struct.pack("<I", len(digests)))
+    for digest in digests:
+        top.update(digest)
+    return top.digest()
+
+def _v2_signer(signer: Signer, digest: bytes) -> bytes:
+    stripping_protection = struct.pack("<II", STRIPPING_PROTECTION_ID, V3_SCHEME)
+    signed_data = b"".join([
+        _sequence([struct.pack("<I", signer.algorithm) + _prefixed(digest)]),
+        _sequence([signer.certificate]),
+        _sequence([stripping_protection])
+    ])
+    signatures = _sequence([struct.pack("<I", signer.algorithm) + _prefixed(signer.sign(signed_data))])
+    return _prefixed(signed_data) + signatures + _prefixed(signer.public_key)
+
+def _v3_signer(signer: Signer, digest: bytes) -> bytes:
+    sdk_range = struct.pack("<II", V3_MIN_SDK, V3_MAX_SDK)
+    signed_data = b"".join([
+        _sequence([struct.pack("<I", signer.algorithm) + _prefixed(digest)]),
+        _sequence([signer.certificate]),
+        sdk_range,
+        _sequence([])
+    ])
+    signatures = _sequence([struct.pack("<I", signer.algorithm) + _prefixed(signer.sign(signed_data))])
+    return _prefixed(signed_data) + sdk_range + signatures + _prefixed(signer.public_key)
+
+def signing_block(signer: Signer, digest: bytes) -> bytes:
+    pairs = b"".join(
+        struct.pack("<QI", 4 + len(value), block_id) + value
+        for block_id, value in (
+            (V2_BLOCK_ID, _sequence([_v2_signer(signer, digest)])),
+            (V3_BLOCK_ID, _sequence([_v3_signer(signer, digest)]))
+        )
+    )
+    size = len(pairs) + 8 + len(BLOCK_MAGIC)
+    return struct.pack("<Q", size) + pairs + struct.pack("<Q", size) + BLOCK_MAGIC
+
+def min_sdk_version(apk: Path) -> int | None:
+    with zipfile.ZipFile(apk) as archive:
+        return axml.min_sdk_version(archive.read("AndroidManifest.xml"))
+
+def can_sign(apk: Path) -> bool:
+    """True when v2/v3 alone are enough, i.e. cryptography is installed and minSdk is 24+"""
+    if pkcs12 is None:
+        logging.info("cryptography is not installed, signing with apksigner")
+        return False
+    min_sdk = min_sdk_version(apk)
+    if min_sdk is None or min_sdk < MIN_SDK_WITHOUT_V1:
+        logging.info(f"minSdkVersion {min_sdk} needs v1 signing, signing with apksigner")
+        return False
+    return True
+
+def sign(apk: Path, dest: Path, keystore: str, password: str, workers: int = SIGNING_WORKERS) -> None:
+    """Write apk to dest with a v2 and v3 signature; entries are copied unchanged"""
+    signer = load_signer(str(keystore), password)
+    with apk.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        entries_end, cd_offset, eocd_offset = find_sections(buffer)
+        with trace.span("digest", bytes=len(buffer)):
+            digest = content_digest(buffer, entries_end, cd_offset, eocd_offset, DIGESTS[signer.algorithm], workers)
+        block = signing_block(signer, digest)
+
+        eocd = bytearray(buffer[eocd_offset:])
+        struct.pack_into("<I", eocd, 16, entries_end + len(block))
+        tmp_path = dest.with_name(f"{dest.name}.tmp")
+        with tmp_path.open("wb") as out, memoryview(buffer) as view:
+            out.write(view[:entries_end])
+            out.write(block)
+            out.write(view[cd_offset:eocd_offset])
+            out.write(eocd)
+    os.replace(tmp_path, dest)
+    logging.info(f"Signed {dest.name} in-process (v2+v3, {len(block)} byte signing block)")
@@ -0,0 +1,199 @@
+import mmap
+import struct
+import logging
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<4sHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<4sHHHHIIH")
+DATA_DESCRIPTOR = struct.Struct("<4sIII")
+
+LOCAL_SIG = b"PK\x03\x04"
+CENTRAL_SIG = b"PK\x01\x02"
+END_SIG = b"PK\x05\x06"
+DESCRIPTOR_SIG = b"PK\x07\x08"
+
+# Stored entries are aligned like zipalign -p does, native libs to 16 KiB pages
+ALIGNMENT = 4
+LIB_ALIGNMENT = 16384
+ALIGNMENT_EXTRA_ID = 0xd935
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+WRITE_BUFFER = 4 * 1024 * 1024
+
+# v1 signature files and the source stamp, invalid once an APK is changed or re-signed
+SIGNATURE_SUFFIXES = (".SF", ".RSA", ".DSA", ".EC")
+SIGNATURE_FILES = {"META-INF/MANIFEST.MF", "stamp-cert-sha256"}
+
+class Entry:
+    """Location of one entry's raw (still compressed) data inside the source archive"""
+    __slots__ = ("name", "flags", "method", "dos_time", "dos_date", "crc",
+                 "compress_size", "file_size", "data_offset", "external_attr")
+
+    def __init__(self, name, flags, method, dos_time, dos_date, crc,
+                 compress_size, file_size, data_offset, external_attr=0):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.crc = crc
+        self.compress_size = compress_size
+        self.file_size = file_size
+        self.data_offset = data_offset
+        self.external_attr = external_attr
+
+def is_signature_file(name: str) -> bool:
+    return name in SIGNATURE_FILES or (name.startswith("META-INF/") and name.endswith(SIGNATURE_SUFFIXES))
+
+def _dos_datetime(date_time: tuple) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+def read_entries(buffer) -> list[Entry] | None:
+    """Read entries from the central directory, or None if the archive needs repair.
+
+    Only the central directory and each local header are touched, so a
+    healthy archive is checked without reading any entry data.
+    """
+    try:
+        buffer.seek(0)
+        with zipfile.ZipFile(buffer) as archive:
+            infos = archive.infolist()
+    except (zipfile.BadZipFile, ValueError, OSError):
+        return None
+
+    entries = []
+    end_of_data = len(buffer)
+    for info in sorted(infos, key=lambda i: i.header_offset):
+        offset = info.header_offset
+        if offset + LOCAL_HEADER.size > end_of_data:
+            return None
+        header = LOCAL_HEADER.unpack_from(buffer, offset)
+        if header[0] != LOCAL_SIG:
+            return None
+        name_length, extra_length = header[9], header[10]
+        name = bytes(buffer[offset + LOCAL_HEADER.size:offset + LOCAL_HEADER.size + name_length])
+        if name.decode("utf-8" if header[2] & FLAG_UTF8 else "cp437", "replace") != info.orig_filename:
+            return None
+
+        data_offset = offset + LOCAL_HEADER.size + name_length + extra_length
+        if data_offset + info.compress_size > end_of_data:
+            return None
+        if info.compress_size >= 0xFFFFFFFF or info.file_size >= 0xFFFFFFFF:
+            # Zip64 archives are left to the external tools
+            raise ValueError(f"{info.filename} needs Zip64")
+
+        dos_time, dos_date = _dos_datetime(info.date_time)
+        entries.append(Entry(
+            info.orig_filename, info.flag_bits, info.compress_type, dos_time, dos_date,
+            info.CRC, info.compress_size, info.file_size, data_offset, info.external_attr
+        ))
+
+    # Overlapping entries mean a damaged central directory
+    for previous, current in zip(entries, entries[1:]):
+        if previous.data_offset + previous.compress_size > current.data_offset:
+            return None
+
+    return entries
+
+def scan_entries(buffer) -> list[Entry]:
+    """Recover entries by walking local headers, like zip -FF does"""
+    entries = []
+    offset = buffer.find(LOCAL_SIG, 0)
+    while offset != -1 and offset + LOCAL_HEADER.size <= len(buffer):
+        (_, _, flags, method, dos_time, dos_date, crc, compress_size,
+         file_size, name_length, extra_length) = LOCAL_HEADER.unpack_from(buffer, offset)
+        name_start = offset + LOCAL_HEADER.size
+        data_offset = name_start + name_length + extra_length
+        name = bytes(buffer[name_start:name_start + name_length]).decode(
+            "utf-8" if flags & FLAG_UTF8 else "cp437", "replace"
+        )
+
+        if flags & FLAG_DATA_DESCRIPTOR:
+            # Sizes follow the data, find the descriptor whose size matches its position
+            search = data_offset
+            while True:
+                found = buffer.find(DESCRIPTOR_SIG, search)
+                if found == -1 or found + DATA_DESCRIPTOR.size > len(buffer):
+                    compress_size = None
+                    break
+                _, crc, compress_size, file_size = DATA_DESCRIPTOR.unpack_from(buffer, found)
+                if found - data_offset == compress_size:
+                    break
+                search = found + 1
+            if compress_size is None:
+                logging.warning(f"Dropping truncated entry: {name}")
+                break
+            next_offset = data_offset + compress_size + DATA_DESCRIPTOR.size
+        else:
+            next_offset = data_offset + compress_size
+
+        if next_offset > len(buffer):
+            logging.warning(f"Dropping truncated entry: {name}")
+            break
+
+        entries.append(Entry(name, flags, method, dos_time, dos_date, crc,
+                             compress_size, file_size, data_offset))
+        offset = buffer.find(LOCAL_SIG, next_offset)
+
+    return entries
+
+def _alignment_extra(name: str, method: int, header_end: int) -> bytes:
+    if method != zipfile.ZIP_STORED:
+        return b""
+    alignment = LIB_ALIGNMENT if name.endswith(".so") else ALIGNMENT
+    padding = -(header_end + 6) % alignment
+    return struct.pack("<HHH", ALIGNMENT_EXTRA_ID, 2 + padding, alignment) + b"\0" * padding
+
+def write_entries(buffer, entries: list[Entry], dest: Path) -> None:
+    """Write entries to dest in one sequential pass, copying compressed data raw"""
+    central = bytearray()
+    offset = 0
+
+    with dest.open("wb", buffering=WRITE_BUFFER) as out, memoryview(buffer) as view:
+        for entry in entries:
+            flags = entry.flags & ~FLAG_DATA_DESCRIPTOR
+            encoded_name = entry.name.encode("utf-8" if flags & FLAG_UTF8 else "cp437", "replace")
+            extra = _alignment_extra(entry.name, entry.method, offset + LOCAL_HEADER.size + len(encoded_name))
+            version = 20 if entry.method == zipfile.ZIP_DEFLATED else 10
+
+            out.write(LOCAL_HEADER.pack(
+                LOCAL_SIG, version, flags, entry.method, entry.dos_time, entry.dos_date,
+                entry.crc, entry.compress_size, entry.file_size, len(encoded_name), len(extra)
+            ))
+            out.write(encoded_name)
+            out.write(extra)
+            out.write(view[entry.data_offset:entry.data_offset + entry.compress_size])
+
+            central += CENTRAL_HEADER.pack(
+                CENTRAL_SIG, version, version, flags, entry.method, entry.dos_time, entry.dos_date,
+                entry.crc, entry.compress_size, entry.file_size, len(encoded_name), 0, 0, 0, 0,
+                entry.external_attr, offset
+            )
+            central += encoded_name
+            offset += LOCAL_HEADER.size + len(encoded_name) + len(extra) + entry.compress_size
+
+        out.write(central)
+        out.write(END_RECORD.pack(END_SIG, 0, 0, len(entries), len(entries), len(central), offset, 0))
+
+def rewrite(src: Path, dest: Path, keep: Callable[[str], bool] = None) -> bool:
+    """Copy src to dest keeping only entries accepted by keep, repairing it on the way if needed.
+
+    Returns True when the archive had to be repaired.
+    """
+    with src.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        entries = read_entries(buffer)
+        repaired = entries is None
+        if repaired:
+            logging.warning(f"{src.name} has a damaged central directory, rebuilding it from local headers")
+            entries = scan_entries(buffer)
+
+        kept = [entry for entry in entries if keep is None or keep(entry.name)]
+        write_entries(buffer, kept, dest)
+
+    logging.info(f"Rewrote {src.name}: kept {len(kept)}/{len(entries)} entries ({dest.stat().st_size} bytes)")
+    return repaired
@@ -1,44 +1,86 @@
 import base64
-import requests
+import threading
 from typing import Dict
+from src import session
 
 BASE_URL = "https://ws75.aptoide.com/api/7/"
+TIMEOUT = (10, 30)
+PAGE_SIZE = 50
+
+# Per (package, q) listing state: vername -> file info, plus how far we paged
+_listings = {}
+_searches = {}
+_lock = threading.Lock()
+_search_lock = threading.Lock()
+
+def _get_json(url: str) -> dict:
+    response = session.get(url, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def _search(package: str, q: str) -> dict | None:
+    """First trusted search hit for a package, fetched once per (package, q)"""
+    key = (package, q)
+    with _search_lock:
+        if key not in _searches:
+            url = f"{BASE_URL}apps/search?query={package}&limit=1&trusted=true{q}"
+            hits = _get_json(url)['datalist']['list']
+            _searches[key] = hits[0] if hits else None
+        return _searches[key]
+
+def _find_version(package: str, q: str, version: str) -> dict | None:
+    """Page through listAppVersions lazily until version shows up or the list ends"""
+    with _lock:
+        listing = _listings.setdefault((package, q), {
+            "files": {}, "offset": 0, "done": False, "lock": threading.Lock()
+        })
+
+    # One pager per listing, other threads wait and then read the cache
+    with listing["lock"]:
+        while version not in listing["files"] and not listing["done"]:
+            url = f"{BASE_URL}listAppVersions?package_name={package}&limit={PAGE_SIZE}&offset={listing['offset']}{q}"
+            datalist = _get_json(url)['datalist']
+            apps = datalist.get('list', [])
+            for app in apps:
+                listing["files"].setdefault(app['file']['vername'], dict(app['file']))
+            listing["offset"] += len(apps)
+            if len(apps) < PAGE_SIZE or listing["offset"] >= datalist.get('total', float('inf')):
+                listing["done"] = True
+
+        return listing["files"].get(version)
 
 def get_latest_version(app_name: str, config: Dict) -> str:
     package = config['package']
     arch = config.get('arch', 'universal')
     q = _get_q_param(arch)
-    url = f"{BASE_URL}apps/search?query={package}&limit=1&trusted=true{q}"
-    res = requests.get(url).json()
-    if res['datalist']['list']:
-        return res['datalist']['list'][0]['file']['vername']
+    hit = _search(package, q)
+    if hit:
+        return hit['file']['vername']
     raise ValueError(f"No version found for {package}")
 
 def get_download_link(version: str, app_name: str, config: Dict) -> str:
     package = config['package']
+    # One link per build: prepare_input resolves with the app's configured
+    # arch and every requested arch is filtered out of that single APK
     arch = config.get('arch', 'universal')
     q = _get_q_param(arch)
 
     if version.lower() == "latest":
-        url = f"{BASE_URL}apps/search?query={package}&limit=1&trusted=true{q}"
-        res = requests.get(url).json()
-        return res['datalist']['list'][0]['file']['path']
+        hit = _search(package, q)
+        if not hit:
+            raise ValueError(f"No version found for {package}")
+        return hit['file']['path']
 
     # Find vercode for specific version
-    url_versions = f"{BASE_URL}listAppVersions?package_name={package}&limit=50{q}"
-    res_v = requests.get(url_versions).json()
-    vercode = None
-    for app in res_v['datalist']['list']:
-        if app['file']['vername'] == version:
-            vercode = app['file']['vercode']
-            break
-    if not vercode:
+    file = _find_version(package, q, version)
+    if not file:
         raise ValueError(f"Version {version} not found for {package}")
 
-    # Get meta with download path
-    url_meta = f"{BASE_URL}getAppMeta?package_name={package}&vercode={vercode}{q}"
-    res_meta = requests.get(url_meta).json()
-    return res_meta['data']['file']['path']
+    if not file.get('path'):
+        # Get meta with download path
+        url_meta = f"{BASE_URL}getAppMeta?package_name={package}&vercode={file['vercode']}{q}"
+        file['path'] = _get_json(url_meta)['data']['file']['path']
+    return file['path']
 
 def _get_q_param(arch: str) -> str:
     if arch == 'universal':
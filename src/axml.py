@@ -0,0 +1,95 @@
+import struct
+
+# Chunk types of compiled Android XML (ResourceTypes.h)
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+CHUNK = struct.Struct("<HHI")
+POOL_HEADER = struct.Struct("<HHIIIIII")
+ATTRIBUTE = struct.Struct("<IIIHBBI")
+
+UTF8_FLAG = 0x100
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+
+# android.R.attr.minSdkVersion
+ATTR_MIN_SDK_VERSION = 0x0101020c
+
+def _utf8_length(data, pos: int) -> tuple[int, int]:
+    length = data[pos]
+    if length & 0x80:
+        return ((length & 0x7F) << 8) | data[pos + 1], pos + 2
+    return length, pos + 1
+
+def _utf16_length(data, pos: int) -> tuple[int, int]:
+    length, = struct.unpack_from("<H", data, pos)
+    if length & 0x8000:
+        low, = struct.unpack_from("<H", data, pos + 2)
+        return ((length & 0x7FFF) << 16) | low, pos + 4
+    return length, pos + 2
+
+def read_strings(data, offset: int = 0) -> list[str]:
+    """Strings of the ResStringPool chunk at offset"""
+    _, header_size, _, count, _, flags, strings_start, _ = POOL_HEADER.unpack_from(data, offset)
+    utf8 = bool(flags & UTF8_FLAG)
+    strings = []
+    for string_offset in struct.unpack_from(f"<{count}I", data, offset + header_size):
+        pos = offset + strings_start + string_offset
+        if utf8:
+            _, pos = _utf8_length(data, pos)
+            length, pos = _utf8_length(data, pos)
+            strings.append(bytes(data[pos:pos + length]).decode("utf-8", "surrogatepass"))
+        else:
+            length, pos = _utf16_length(data, pos)
+            strings.append(bytes(data[pos:pos + 2 * length]).decode("utf-16-le", "surrogatepass"))
+    return strings
+
+def _chunks(data, start: int, end: int):
+    """(offset, type, header_size, size) of every chunk between start and end"""
+    offset = start
+    while offset < end:
+        chunk_type, header_size, size = CHUNK.unpack_from(data, offset)
+        if size < CHUNK.size or offset + size > end:
+            raise ValueError(f"malformed chunk 0x{chunk_type:04x} at {offset}")
+        yield offset, chunk_type, header_size, size
+        offset += size
+
+def _elements(data):
+    """(name, attributes) of every start element; attributes are (resource id, data type, data)"""
+    chunk_type, header_size, size = CHUNK.unpack_from(data, 0)
+    if chunk_type != RES_XML_TYPE:
+        raise ValueError("not a binary XML document")
+
+    strings = None
+    resource_ids = []
+    for offset, child_type, child_header, child_size in _chunks(data, header_size, size):
+        if child_type == RES_STRING_POOL_TYPE:
+            strings = read_strings(data, offset)
+        elif child_type == RES_XML_RESOURCE_MAP_TYPE:
+            count = (child_size - child_header) // 4
+            resource_ids = list(struct.unpack_from(f"<{count}I", data, offset + child_header))
+        elif child_type == RES_XML_START_ELEMENT_TYPE:
+            if strings is None:
+                raise ValueError("binary XML without a string pool")
+            name, attribute_start, attribute_size, count = struct.unpack_from("<IHHH", data, offset + 20)
+            attributes = []
+            for i in range(count):
+                _, attribute_name, _, _, _, data_type, value = ATTRIBUTE.unpack_from(
+                    data, offset + 16 + attribute_start + i * attribute_size
+                )
+                resource_id = resource_ids[attribute_name] if attribute_name < len(resource_ids) else 0
+                attributes.append((resource_id, data_type, value))
+            yield strings[name], attributes
+
+def min_sdk_version(data) -> int | None:
+    """android:minSdkVersion of a binary manifest, None for a preview codename"""
+    for name, attributes in _elements(data):
+        if name != "uses-sdk":
+            continue
+        for resource_id, data_type, value in attributes:
+            if resource_id == ATTR_MIN_SDK_VERSION:
+                return value if data_type in (TYPE_INT_DEC, TYPE_INT_HEX) else None
+    # Without <uses-sdk> the platform assumes API 1
+    return 1
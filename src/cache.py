@@ -0,0 +1,90 @@
+import os
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from src import cache_dir, cache_size_limit
+
+# Release assets are stored once under their content key and hardlinked
+# into the working directory of every build that needs them
+STORE_DIR = Path(cache_dir) / "assets"
+
+def asset_digest(asset: dict) -> str | None:
+    """Return the hex sha256 GitHub publishes for an asset, if any"""
+    digest = asset.get("digest") or ""
+    algorithm, _, value = digest.partition(":")
+    if algorithm == "sha256" and value:
+        return value.lower()
+    return None
+
+def asset_key(asset: dict) -> str:
+    """Content key of an asset: its sha256 when published, so any URL serving the same file shares it"""
+    digest = asset_digest(asset)
+    basis = f"sha256:{digest}" if digest else f"{asset.get('id')}:{asset.get('size')}:"
+    return hashlib.sha256(basis.encode()).hexdigest()
+
+def lookup(asset: dict) -> Path | None:
+    return lookup_key(asset_key(asset), asset.get("size"), asset.get("name"))
+
+def lookup_key(key: str, size: int = None, label: str = None) -> Path | None:
+    """Cached file stored under key, e.g. an asset_key or the digest of a build input"""
+    path = STORE_DIR / key
+    if not path.exists():
+        return None
+
+    if size is not None and path.stat().st_size != size:
+        logging.warning(f"Discarding cached {label or key[:12]}: size mismatch")
+        path.unlink(missing_ok=True)
+        return None
+
+    # Touch on every hit so eviction drops the least recently used entries
+    os.utime(path)
+    return path
+
+def link_into(source: Path, dest: Path) -> Path:
+    """Hardlink source to dest, copying when both are not on the same filesystem"""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+    return dest
+
+def store(asset: dict, filepath: Path) -> None:
+    store_key(asset_key(asset), filepath, asset.get("name"))
+
+def store_key(key: str, filepath: Path, label: str = None) -> None:
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    path = STORE_DIR / key
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    try:
+        link_into(filepath, tmp_path)
+        # Atomic so concurrent builds never see a half-written entry
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not cache {label or key[:12]}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return
+
+    evict()
+
+def evict(limit: int = cache_size_limit) -> None:
+    """Remove least recently used entries until the store fits in limit bytes"""
+    entries = []
+    for path in STORE_DIR.iterdir():
+        if path.suffix == ".tmp":
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        logging.info(f"Evicted cached asset {path.name[:12]} ({size} bytes)")
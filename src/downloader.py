@@ -1,8 +1,20 @@
+import os
 import json
+import queue
 import logging
+import tempfile
+import threading
 from pathlib import Path
+from urllib.parse import urlparse, unquote
+from concurrent.futures import ThreadPoolExecutor
 from src import (
+    cache,
+    cache_dir,
+    apkeditor_tag,
+    limits,
+    trace,
     utils,
+    transfer,
     apkpure,
     session,
     uptodown,
@@ -10,30 +22,48 @@ from src import (
     apkmirror
 )
 
-def download_resource(url: str, name: str = None) -> Path:
-    with session.get(url, stream=True) as res:
-        res.raise_for_status()
-        final_url = res.url
-
-        if not name:
-            name = utils.extract_filename(res, fallback_url=final_url)
+# Bundle files and the CLI are fetched together, each download still takes a host slot
+BUNDLE_WORKERS = 4
+BUNDLE_DIR = Path("bundle-files")
 
-        filepath = Path(name)
-        total_size = int(res.headers.get('content-length', 0))
-        downloaded_size = 0
+def download_resource(url: str, name: str = None, sha256: str = None, directory: Path = None) -> Path:
+    return transfer.download(url, name=name, sha256=sha256, directory=directory)
 
-        with filepath.open("wb") as file:
-            for chunk in res.iter_content(chunk_size=8192):
-                if chunk:
-                    file.write(chunk)
-                    downloaded_size += len(chunk)
+def download_asset(asset: dict) -> Path:
+    """Download a GitHub release asset, reusing the on-disk cache when possible"""
+    filepath = Path(asset["name"])
 
-        logging.info(
-            f"URL: {final_url} [{downloaded_size}/{total_size}] -> \"{filepath}\" [1]"
-        )
+    cached = cache.lookup(asset)
+    if cached:
+        cache.link_into(cached, filepath)
+        logging.info(f"Reused cached asset: {asset['name']} ({asset.get('size')} bytes)")
+        return filepath
 
+    filepath = download_resource(
+        asset["browser_download_url"],
+        name=asset["name"],
+        sha256=cache.asset_digest(asset)
+    )
+    cache.store(asset, filepath)
     return filepath
 
+def cache_asset(asset: dict) -> Path:
+    """Path of a release asset inside the asset cache, downloading it there if missing"""
+    cached = cache.lookup(asset)
+    if cached:
+        return cached
+
+    # Download next to the store, so the store never sees a partial file
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=cache_dir) as scratch:
+        filepath = download_resource(
+            asset["browser_download_url"],
+            name=str(Path(scratch) / asset["name"]),
+            sha256=cache.asset_digest(asset)
+        )
+        cache.store(asset, filepath)
+    return cache.lookup(asset)
+
 def download_required(source: str) -> tuple[list[Path], str]:
     source_path = Path("sources") / f"{source}.json"
     with source_path.open() as json_file:
@@ -61,18 +91,53 @@ def download_required(source: str) -> tuple[list[Path], str]:
                     continue
                 # Download .mpp patches or morphe-cli.jar
                 if asset["name"].endswith(".mpp") or ("morphe-cli" in asset["name"] and asset["name"].endswith(".jar")):
-                    filepath = download_resource(asset["browser_download_url"])
+                    filepath = download_asset(asset)
                     downloaded_files.append(filepath)
         else:
             # Original logic for ReVanced files
             for asset in release["assets"]:
                 if asset["name"].endswith(".asc"):
                     continue
-                filepath = download_resource(asset["browser_download_url"])
+                filepath = download_asset(asset)
                 downloaded_files.append(filepath)
 
     return downloaded_files, name
 
+def _is_pinned_release_url(url: str) -> bool:
+    """GitHub release download URLs with a fixed tag always serve the same file"""
+    parsed = urlparse(url)
+    parts = parsed.path.strip("/").split("/")
+    return (
+        parsed.hostname == "github.com" and len(parts) == 6
+        and parts[2:4] == ["releases", "download"] and parts[4] != "latest"
+    )
+
+def download_bundle_file(url: str, directory: Path, sha256: str = None) -> Path:
+    """Download one bundle file into directory, reusing the asset cache for pinned release URLs"""
+    directory.mkdir(parents=True, exist_ok=True)
+    if not _is_pinned_release_url(url):
+        return download_resource(url, sha256=sha256, directory=directory)
+
+    # With a sha256 the cache entry is shared with the same file fetched through the API
+    asset = {"id": url, "name": unquote(Path(urlparse(url).path).name), "browser_download_url": url}
+    if sha256:
+        asset["digest"] = f"sha256:{sha256}"
+    return cache.link_into(cache_asset(asset), directory / asset["name"])
+
+def download_bundle_cli(bundle_info: dict) -> Path | None:
+    """CLI for a bundle, from the release pinned in the source file or the latest ReVanced CLI"""
+    cli = bundle_info.get("cli", {})
+    release = utils.detect_github_release(
+        cli.get("user", "revanced"), cli.get("repo", "revanced-cli"), cli.get("tag", "latest")
+    )
+    for asset in release["assets"]:
+        if asset["name"].endswith(".asc"):
+            continue
+        if asset["name"].endswith(".jar") and "cli" in asset["name"].lower():
+            # Served from the asset cache when an earlier arch or app already fetched it
+            return download_asset(asset)
+    return None
+
 def download_from_bundle(bundle_info: dict) -> tuple[list[Path], str]:
     """Download resources from a bundle URL"""
     bundle_url = bundle_info["bundle_url"]
@@ -85,87 +150,149 @@ def download_from_bundle(bundle_info: dict) -> tuple[list[Path], str]:
         res.raise_for_status()
         bundle_data = res.json()
     
-    downloaded_files = []
-    
     # Check API version and structure
+    entries = {}
     if "patches" in bundle_data:
-        # API v4 format
-        patches = bundle_data.get("patches", [])
-        integrations = bundle_data.get("integrations", [])
-        
-        # Download patches (JAR files)
-        for patch in patches:
-            if "url" in patch:
-                filepath = download_resource(patch["url"])
-                downloaded_files.append(filepath)
-                logging.info(f"Downloaded patch: {patch.get('name', 'unknown')}")
-        
-        # Download integrations (APK files)
-        for integration in integrations:
-            if "url" in integration:
-                filepath = download_resource(integration["url"])
-                downloaded_files.append(filepath)
-                logging.info(f"Downloaded integration: {integration.get('name', 'unknown')}")
-    
-    # Also download CLI (still needed) - try ReVanced CLI first
-    try:
-        cli_release = utils.detect_github_release("revanced", "revanced-cli", "latest")
-        for asset in cli_release["assets"]:
-            if asset["name"].endswith(".asc"):
+        # API v4 format: patches (JAR files) and integrations (APK files)
+        for key, kind in [("patches", "patch"), ("integrations", "integration")]:
+            for entry in bundle_data.get(key, []):
+                # The same file listed twice is fetched once
+                if "url" in entry and entry["url"] not in entries:
+                    entries[entry["url"]] = (kind, entry)
+
+    downloaded_files = []
+    with ThreadPoolExecutor(max_workers=BUNDLE_WORKERS) as pool:
+        # Also download CLI (still needed), alongside the bundle files
+        cli_future = pool.submit(download_bundle_cli, bundle_info)
+        # One directory per entry, since different URLs may serve files of the same name
+        futures = {
+            pool.submit(download_bundle_file, url, BUNDLE_DIR / str(index), entry.get("sha256")): (kind, entry)
+            for index, (url, (kind, entry)) in enumerate(entries.items())
+        }
+
+        # Collected in bundle order so the dedupe always keeps the same copy
+        digests = {}
+        for future in futures:
+            kind, entry = futures[future]
+            filepath = future.result()
+            digest = utils.file_sha256(filepath)
+            if digest in digests:
+                # Different URLs serving the same file, keep one copy
+                logging.info(f"Skipping duplicate {kind}: {filepath} is identical to {digests[digest]}")
+                if filepath != digests[digest]:
+                    filepath.unlink(missing_ok=True)
                 continue
-            if asset["name"].endswith(".jar") and "cli" in asset["name"].lower():
-                filepath = download_resource(asset["browser_download_url"])
-                downloaded_files.append(filepath)
+            digests[digest] = filepath
+            downloaded_files.append(filepath)
+            logging.info(f"Downloaded {kind}: {entry.get('name', 'unknown')}")
+
+        try:
+            cli_path = cli_future.result()
+            if cli_path:
+                downloaded_files.append(cli_path)
                 logging.info("Downloaded ReVanced CLI")
-                break
-    except Exception as e:
-        logging.warning(f"Could not download ReVanced CLI: {e}")
+        except Exception as e:
+            logging.warning(f"Could not download ReVanced CLI: {e}")
     
     return downloaded_files, name
 
-def download_platform(app_name: str, platform: str, cli: str, patches: str, arch: str = None) -> tuple[Path | None, str | None]:
-    try:
-        config_path = Path("apps") / platform / f"{app_name}.json"
-        if not config_path.exists():
-            raise FileNotFoundError(f"Config file not found: {config_path}")
+# Mirrors in order of preference, each one starts HEDGE_DELAY seconds after the previous
+MIRRORS = ["apkmirror", "apkpure", "uptodown", "aptoide"]
+HEDGE_DELAY = float(os.getenv("MIRROR_HEDGE_DELAY", "0.5"))
 
-        with config_path.open() as json_file:
-            config = json.load(json_file)
-        
-        # Override arch if specified
-        if arch:
-            config['arch'] = arch
+_supported_versions = {}
+_supported_versions_lock = threading.Lock()
 
-        version = config.get("version") or utils.get_supported_version(config['package'], cli, patches)
-        platform_module = globals()[platform]
-        version = version or platform_module.get_latest_version(app_name, config)
-        
-        download_link = platform_module.get_download_link(version, app_name, config)
-        filepath = download_resource(download_link)
-        return filepath, version 
+def get_supported_version(package: str, cli: str, patches: str) -> str | None:
+    """Memoized utils.get_supported_version, shared by concurrent mirror lookups"""
+    key = (package, cli, patches)
+    with _supported_versions_lock:
+        if key not in _supported_versions:
+            with trace.span("supported_versions", package=package):
+                _supported_versions[key] = utils.get_supported_version(package, cli, patches)
+        return _supported_versions[key]
 
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        return None, None
+def load_platform_config(app_name: str, platform: str) -> dict | None:
+    config_path = Path("apps") / platform / f"{app_name}.json"
+    if not config_path.exists():
+        return None
 
-# Update the specific download functions
-def download_apkmirror(app_name: str, cli: str, patches: str, arch: str = None) -> tuple[Path | None, str | None]:
-    return download_platform(app_name, "apkmirror", cli, patches, arch)
+    with config_path.open() as json_file:
+        return json.load(json_file)
 
-def download_apkpure(app_name: str, cli: str, patches: str, arch: str = None) -> tuple[Path | None, str | None]:
-    return download_platform(app_name, "apkpure", cli, patches, arch)
+def resolve_platform(app_name: str, platform: str, cli: str, patches: str, arch: str = None) -> tuple[str | None, str | None]:
+    """Resolve the download link and version of an app on one mirror"""
+    config = load_platform_config(app_name, platform)
+    if config is None:
+        raise FileNotFoundError(f"Config file not found: {Path('apps') / platform / f'{app_name}.json'}")
 
-def download_aptoide(app_name: str, cli: str, patches: str, arch: str = None) -> tuple[Path | None, str | None]:
-    return download_platform(app_name, "aptoide", cli, patches, arch)
+    # Override arch if specified
+    if arch:
+        config['arch'] = arch
 
-def download_uptodown(app_name: str, cli: str, patches: str, arch: str = None) -> tuple[Path | None, str | None]:
-    return download_platform(app_name, "uptodown", cli, patches, arch)
+    version = config.get("version") or get_supported_version(config['package'], cli, patches)
+    platform_module = globals()[platform]
+    # Listing supported versions runs the CLI, no request in between notices a lost race
+    limits.check_cancelled()
+    version = version or platform_module.get_latest_version(app_name, config)
+
+    download_link = platform_module.get_download_link(version, app_name, config)
+    return download_link, version
+
+def resolve_download(app_name: str, cli: str, patches: str, arch: str = None,
+                     exclude: list[str] = None, hedge_delay: float = HEDGE_DELAY) -> tuple[str | None, str | None, str | None]:
+    """Race every configured mirror and return (platform, link, version) of the first valid link"""
+    platforms = [
+        platform for platform in MIRRORS
+        if platform not in (exclude or []) and load_platform_config(app_name, platform) is not None
+    ]
+    if not platforms:
+        return None, None, None
+
+    results = queue.Queue()
+    done = threading.Event()
+
+    def attempt(platform: str, delay: float, parent: str | None) -> None:
+        # A mirror that has not started yet is skipped once a winner exists
+        if done.wait(delay):
+            results.put((platform, None, None))
+            return
+        try:
+            # Once a winner exists, the next request of this mirror raises Cancelled
+            with limits.cancel_scope(done), trace.span("mirror", parent=parent, platform=platform):
+                link, version = resolve_platform(app_name, platform, cli, patches, arch)
+        except limits.Cancelled:
+            logging.info(f"{platform}: stopped, another mirror won the race")
+            link, version = None, None
+        except (Exception, SystemExit) as e:
+            logging.error(f"{platform}: {e}")
+            link, version = None, None
+        results.put((platform, link, version))
+
+    # Daemon threads, so a losing mirror stuck in a request never holds up the build or interpreter exit
+    parent = trace.current()
+    for index, platform in enumerate(platforms):
+        threading.Thread(target=attempt, args=(platform, index * hedge_delay, parent), daemon=True).start()
+
+    for _ in platforms:
+        platform, link, version = results.get()
+        if link and version:
+            done.set()
+            logging.info(f"🏁 {platform} won the mirror race for {app_name} v{version}")
+            return platform, link, version
+
+    return None, None, None
 
 def download_apkeditor() -> Path:
-    release = utils.detect_github_release("REAndroid", "APKEditor", "latest")
+    """The pinned APKEditor jar, straight from the asset cache"""
+    try:
+        release = utils.detect_github_release("REAndroid", "APKEditor", apkeditor_tag)
+    except Exception as e:
+        logging.warning(f"APKEditor {apkeditor_tag} not available, using the latest release: {e}")
+        release = utils.detect_github_release("REAndroid", "APKEditor", "latest")
 
     for asset in release["assets"]:
         if asset["name"].startswith("APKEditor") and asset["name"].endswith(".jar"):
-            return download_resource(asset["browser_download_url"])
+            return cache_asset(asset)
 
-    raise RuntimeError("APKEditor .jar file not found in the latest release")
+    raise RuntimeError(f"APKEditor .jar file not found in release {release['tag_name']}")
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src import limits, github_api
+
+# Config folders every isolated build directory needs to see
+SHARED_DIRS = ["apps", "patches", "sources", "keystore"]
+
+def _init_worker(host_slots: dict, jvm_slots, buckets: dict) -> None:
+    limits.configure(host_slots, jvm_slots, buckets)
+
+def _build_worker(app_name: str, source: str, arches: list[str], root: str, work_dir: str) -> dict:
+    """Run one app build inside its own working directory"""
+    from src.__main__ import run_multi_arch_build
+
+    root_path = Path(root)
+    work_path = Path(work_dir)
+    work_path.mkdir(parents=True, exist_ok=True)
+    for name in SHARED_DIRS:
+        link = work_path / name
+        if not link.exists():
+            link.symlink_to(root_path / name, target_is_directory=True)
+
+    # Tag every log line so interleaved output stays readable
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(
+            f"%(asctime)s [{app_name}/{source}] %(message)s", "%Y-%m-%d %H:%M:%S"
+        ))
+
+    result = {"app_name": app_name, "source": source, "arches": arches, "apks": [], "error": None}
+    start = time.monotonic()
+    os.chdir(work_path)
+    try:
+        for apk in run_multi_arch_build(app_name, source, arches):
+            shutil.move(apk, root_path / Path(apk).name)
+            result["apks"].append(Path(apk).name)
+        fragment = Path(f"manifest-{app_name}-{source}.json")
+        if fragment.exists():
+            shutil.move(fragment, root_path / fragment.name)
+        if not result["apks"]:
+            result["error"] = "no APK produced"
+    except (Exception, SystemExit) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir(root_path)
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    result["duration"] = time.monotonic() - start
+    return result
+
+def load_builds(only: list[str] = None) -> list[tuple[str, str, list[str]]]:
+    from src.__main__ import get_arches
+
+    with open("patch-config.json") as f:
+        patch_list = json.load(f)["patch_list"]
+
+    arch_config = []
+    if Path("arch-config.json").exists():
+        with open("arch-config.json") as f:
+            arch_config = json.load(f)
+
+    builds = []
+    for entry in patch_list:
+        app_name, source = entry["app_name"], entry["source"]
+        if only and app_name not in only:
+            continue
+        builds.append((app_name, source, get_arches(app_name, source, arch_config)))
+    return builds
+
+def print_summary(results: list[dict], elapsed: float) -> None:
+    results = sorted(results, key=lambda r: (r["error"] is not None, r["app_name"]))
+    width = max([len(f"{r['app_name']} ({r['source']})") for r in results] + [10])
+
+    print(f"\n{'Build':<{width}}  {'Status':<7}  {'Time':>8}  Details")
+    print(f"{'-' * width}  {'-' * 7}  {'-' * 8}  {'-' * 20}")
+    for r in results:
+        label = f"{r['app_name']} ({r['source']})"
+        status = "❌ fail" if r["error"] else "✅ ok"
+        details = r["error"] or ", ".join(r["apks"])
+        print(f"{label:<{width}}  {status:<7}  {r['duration']:>7.1f}s  {details}")
+
+    succeeded = sum(1 for r in results if not r["error"])
+    print(f"\n🎯 {succeeded}/{len(results)} builds succeeded in {elapsed:.1f}s")
+
+def main(args: list[str] = None) -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(prog="python -m src build-all", description="Build every app in patch-config.json")
+    parser.add_argument("--jobs", type=int, default=cpus, help="concurrent builds (default: CPU count)")
+    parser.add_argument("--jvm-slots", type=int, default=max(1, cpus // 4), help="concurrent patcher JVMs")
+    parser.add_argument("--host-limit", action="append", default=[], metavar="DOMAIN=N",
+                        help="override a per-host request limit, e.g. apkmirror.com=1")
+    parser.add_argument("--work-dir", default="build", help="parent of the per-build working directories")
+    parser.add_argument("--only", nargs="+", metavar="APP", help="build only these apps")
+    parser.add_argument("--incremental", action="store_true",
+                        help="build only the arches whose inputs changed since the manifest was written")
+    options = parser.parse_args(args)
+
+    host_limits = limits.host_limits(options.host_limit)
+
+    builds = load_builds(options.only)
+    if options.incremental:
+        from src import manifest
+        published = manifest.load()
+        builds = [(app_name, source, manifest.stale_arches(app_name, source, arches, published))
+                  for app_name, source, arches in builds]
+        builds = [build for build in builds if build[2]]
+    if not builds:
+        logging.error("No builds selected")
+        return
+
+    root = Path.cwd()
+    # Builds run in their own directories but share the pre-resolved releases of the root
+    os.environ["GITHUB_RELEASES_FILE"] = str(root / github_api.releases_file())
+    os.environ.setdefault("TRACE_DIR", str(root / "traces"))
+    logging.info(f"🚀 Building {len(builds)} apps with {options.jobs} workers and {options.jvm_slots} JVM slots")
+
+    start = time.monotonic()
+    results = []
+    with multiprocessing.Manager() as manager:
+        host_slots = {domain: manager.BoundedSemaphore(n) for domain, n in host_limits.items()}
+        jvm_slots = manager.BoundedSemaphore(options.jvm_slots)
+        # One request budget per rate-limited host for all workers together
+        buckets = limits.shared_buckets(manager)
+
+        with ProcessPoolExecutor(
+            max_workers=options.jobs,
+            initializer=_init_worker,
+            initargs=(host_slots, jvm_slots, buckets),
+            max_tasks_per_child=1
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _build_worker, app_name, source, arches, str(root),
+                    str(root / options.work_dir / f"{app_name}-{source}")
+                ): (app_name, source, arches)
+                for app_name, source, arches in builds
+            }
+            for future in as_completed(futures):
+                app_name, source, arches = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"app_name": app_name, "source": source, "arches": arches,
+                              "apks": [], "error": f"worker crashed: {e}", "duration": 0.0}
+                results.append(result)
+                logging.info(f"{'✅' if not result['error'] else '❌'} {app_name} ({source}) finished in {result['duration']:.1f}s")
+
+    try:
+        (root / options.work_dir).rmdir()
+    except OSError:
+        pass
+
+    print_summary(results, time.monotonic() - start)
+
+    # Record what was built, so the next --incremental run skips it
+    from src import manifest
+    published, _ = manifest.merge(manifest.load(), root, recursive=False, remove=True)
+    manifest.save(published)
+
+    # Let the workflow see a partial failure; the builds that worked are recorded above
+    failed = [result for result in results if result["error"]]
+    if failed:
+        logging.error(f"❌ {len(failed)} of {len(results)} builds failed")
+        sys.exit(1)
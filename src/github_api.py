@@ -0,0 +1,265 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import quote
+from src import LimitedSession, github_token, apkeditor_tag, pages
+
+API_URL = "https://api.github.com"
+GRAPHQL_URL = f"{API_URL}/graphql"
+RELEASES_PER_PAGE = 30
+
+# Releases resolved ahead of time by resolve_sources, read by every build instead of the API;
+# GITHUB_RELEASES_FILE is read on first use so fleet can point its workers at the root's file
+DEFAULT_RELEASES_FILE = "releases.json"
+REPOS_PER_QUERY = 20
+ASSETS_PER_RELEASE = 50
+
+# Releases every build may need besides the ones named in sources/*.json
+EXTRA_RELEASES = [
+    ("revanced", "revanced-cli", "latest"),
+    ("REAndroid", "APKEditor", apkeditor_tag),
+]
+
+# Every call is a conditional GET through the page cache, and GitHub does not
+# count 304 answers against the rate limit
+api = LimitedSession()
+api.headers.update({
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28"
+})
+if github_token:
+    api.headers["Authorization"] = f"Bearer {github_token}"
+
+_releases = {}
+_resolved = None
+_lock = threading.Lock()
+
+def _get_json(path: str):
+    text = pages.fetch(api, f"{API_URL}{path}", ttl=0)
+    if text is None:
+        raise ValueError(f"GitHub API request failed: {path}")
+    return json.loads(text)
+
+def _matches(release: dict, tag: str) -> bool:
+    if tag == "dev":
+        return "dev" in release["tag_name"].lower()
+    if tag == "prerelease":
+        return release["prerelease"]
+    return True
+
+def _newest_release(user: str, repo: str, tag: str) -> dict | None:
+    """Walk release pages newest first, stopping once no older page can hold a newer match"""
+    best = None
+    page = 1
+    while True:
+        releases = _get_json(f"/repos/{user}/{repo}/releases?per_page={RELEASES_PER_PAGE}&page={page}")
+        for release in releases:
+            if _matches(release, tag) and (best is None or release["created_at"] > best["created_at"]):
+                best = release
+
+        if len(releases) < RELEASES_PER_PAGE:
+            return best
+        # Pages are ordered by creation date, so a match older than this page's tail cannot lose anymore
+        if best is not None and min(r["created_at"] for r in releases) < best["created_at"]:
+            return best
+        page += 1
+
+def _resolve(user: str, repo: str, tag: str) -> dict:
+    if tag == "latest":
+        release = _get_json(f"/repos/{user}/{repo}/releases/latest")
+        logging.info(f"Fetched latest release: {release['tag_name']}")
+        return release
+
+    if tag in ["", "dev", "prerelease"]:
+        release = _newest_release(user, repo, tag)
+        if release is None:
+            kind = {"": "release", "dev": "dev release", "prerelease": "prerelease"}[tag]
+            raise ValueError(f"No {kind} found for {user}/{repo}")
+        logging.info(f"Fetched release: {release['tag_name']}")
+        return release
+
+    try:
+        release = _get_json(f"/repos/{user}/{repo}/releases/tags/{quote(tag, safe='')}")
+        logging.info(f"Fetched release: {release['tag_name']}")
+        return release
+    except Exception as e:
+        logging.error(f"Error fetching release {tag} for {user}/{repo}: {e}")
+        raise
+
+def _release_key(user: str, repo: str, tag: str) -> str:
+    return f"{user.lower()}/{repo.lower()}@{tag}"
+
+def releases_file() -> Path:
+    return Path(os.getenv("GITHUB_RELEASES_FILE", DEFAULT_RELEASES_FILE))
+
+def _load_resolved() -> dict:
+    global _resolved
+    with _lock:
+        if _resolved is None:
+            path = releases_file()
+            try:
+                with path.open() as f:
+                    _resolved = json.load(f).get("releases", {})
+                logging.info(f"Loaded {len(_resolved)} pre-resolved releases from {path}")
+            except (OSError, ValueError):
+                _resolved = {}
+        return _resolved
+
+def get_release(user: str, repo: str, tag: str) -> dict:
+    """Release JSON for a source tag ("latest", "", "dev", "prerelease" or a tag name), once per run"""
+    resolved = _load_resolved().get(_release_key(user, repo, tag))
+    if resolved:
+        logging.info(f"Using pre-resolved release: {resolved['tag_name']}")
+        return resolved
+
+    key = (user.lower(), repo.lower(), tag)
+    with _lock:
+        entry = _releases.setdefault(key, {"lock": threading.Lock()})
+
+    # Concurrent callers of the same release wait for the first one instead of asking again
+    with entry["lock"]:
+        if "release" not in entry:
+            entry["release"] = _resolve(user, repo, tag)
+        return entry["release"]
+
+# --- Batched resolution of every source in one go ---
+
+RELEASE_FIELDS = f"""
+fragment release on Release {{
+  tagName name isPrerelease isDraft createdAt publishedAt url
+  releaseAssets(first: {ASSETS_PER_RELEASE}) {{ nodes {{ id name size contentType downloadUrl }} }}
+}}
+"""
+
+def collect_sources(sources_dir: Path = Path("sources")) -> list[tuple[str, str, str]]:
+    """Every (user, repo, tag) named in sources/*.json, plus the tools bundles fall back to"""
+    wanted = list(EXTRA_RELEASES)
+    for path in sorted(sources_dir.glob("*.json")):
+        with path.open() as f:
+            info = json.load(f)
+        # Bundle sources list their files by URL, not by release
+        if isinstance(info, list):
+            wanted += [(entry["user"], entry["repo"], entry["tag"]) for entry in info[1:]]
+    return list(dict.fromkeys(wanted))
+
+def _rest_release(node: dict) -> dict:
+    """Shape a GraphQL release like the REST release JSON the downloaders read"""
+    return {
+        "tag_name": node["tagName"],
+        "name": node["name"],
+        "prerelease": node["isPrerelease"],
+        "draft": node["isDraft"],
+        "created_at": node["createdAt"],
+        "published_at": node["publishedAt"],
+        "html_url": node["url"],
+        "assets": [
+            {
+                "id": asset["id"],
+                "name": asset["name"],
+                "size": asset["size"],
+                "content_type": asset["contentType"],
+                "browser_download_url": asset["downloadUrl"]
+            }
+            for asset in node["releaseAssets"]["nodes"]
+        ]
+    }
+
+def _repository_query(alias: str, user: str, repo: str, tags: list[str]) -> str:
+    fields = []
+    if "latest" in tags:
+        fields.append("latestRelease { ...release }")
+    if any(tag in ["", "dev", "prerelease"] for tag in tags):
+        fields.append(
+            f"releases(first: {RELEASES_PER_PAGE}, orderBy: {{field: CREATED_AT, direction: DESC}}) "
+            "{ nodes { ...release } }"
+        )
+    for index, tag in enumerate(t for t in tags if t not in ["latest", "", "dev", "prerelease"]):
+        fields.append(f"tag{index}: release(tagName: {json.dumps(tag)}) {{ ...release }}")
+    return f"{alias}: repository(owner: {json.dumps(user)}, name: {json.dumps(repo)}) {{ {' '.join(fields)} }}"
+
+def _pick(repository: dict, tags: list[str]) -> dict:
+    """Map each tag to its release within one repository's query result"""
+    picked = {}
+    named = [t for t in tags if t not in ["latest", "", "dev", "prerelease"]]
+    for tag in tags:
+        if tag == "latest":
+            release = repository.get("latestRelease") and _rest_release(repository["latestRelease"])
+        elif tag in named:
+            node = repository.get(f"tag{named.index(tag)}")
+            release = node and _rest_release(node)
+        else:
+            # Only the newest page is queried, older matches are left to the REST walk
+            matches = [_rest_release(n) for n in repository["releases"]["nodes"]]
+            matches = [r for r in matches if _matches(r, tag)]
+            release = max(matches, key=lambda r: r["created_at"]) if matches else None
+        if release:
+            picked[tag] = release
+    return picked
+
+def resolve_sources(wanted: list[tuple[str, str, str]]) -> tuple[dict, dict]:
+    """Resolve releases in batched GraphQL queries, returning (releases by key, rate limit usage)"""
+    if not github_token:
+        raise ValueError("GITHUB_TOKEN is required for the GraphQL API")
+
+    # GitHub names are case-insensitive, so query each repository once
+    repos = {}
+    for user, repo, tag in wanted:
+        name, tags = repos.setdefault((user.lower(), repo.lower()), ((user, repo), []))
+        if tag not in tags:
+            tags.append(tag)
+    repo_list = list(repos.values())
+
+    releases = {}
+    usage = {"queries": 0, "cost": 0, "remaining": None, "limit": None, "reset_at": None}
+    for start in range(0, len(repo_list), REPOS_PER_QUERY):
+        batch = repo_list[start:start + REPOS_PER_QUERY]
+        query = "query {\n  rateLimit { cost remaining limit resetAt }\n"
+        query += "\n".join(
+            f"  {_repository_query(f'r{index}', user, repo, tags)}"
+            for index, ((user, repo), tags) in enumerate(batch)
+        )
+        query += "\n}\n" + RELEASE_FIELDS
+
+        response = api.post(GRAPHQL_URL, json={"query": query})
+        response.raise_for_status()
+        result = response.json()
+        for error in result.get("errors", []):
+            logging.warning(f"GraphQL: {error.get('message')}")
+
+        data = result.get("data") or {}
+        rate = data.get("rateLimit") or {}
+        usage["queries"] += 1
+        usage["cost"] += rate.get("cost", 0)
+        usage.update(remaining=rate.get("remaining"), limit=rate.get("limit"), reset_at=rate.get("resetAt"))
+
+        for index, ((user, repo), tags) in enumerate(batch):
+            repository = data.get(f"r{index}")
+            if not repository:
+                logging.warning(f"Repository {user}/{repo} not found")
+                continue
+            for tag, release in _pick(repository, tags).items():
+                releases[_release_key(user, repo, tag)] = release
+
+    return releases, usage
+
+def main(args: list[str]) -> None:
+    """python -m src resolve-releases [output]: write every source's release to a file"""
+    output = Path(args[0]) if args else releases_file()
+    wanted = collect_sources()
+    releases, usage = resolve_sources(wanted)
+
+    tmp_path = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump({"releases": releases, "rate_limit": usage}, f, indent=2)
+    os.replace(tmp_path, output)
+
+    for user, repo, tag in wanted:
+        if _release_key(user, repo, tag) not in releases:
+            logging.warning(f"Unresolved: {user}/{repo}@{tag or '<newest>'}, builds will query it themselves")
+    logging.info(f"✅ Resolved {len(releases)}/{len(wanted)} releases into {output}")
+    logging.info(
+        f"📉 GraphQL rate limit: {usage['cost']} points over {usage['queries']} queries, "
+        f"{usage['remaining']}/{usage['limit']} left (resets {usage['reset_at']})"
+    )
@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from src import utils, cache_dir
+
+# One AppCDS archive per (tool jar, Java runtime)
+CDS_DIR = Path(cache_dir) / "cds"
+STATS_PATH = CDS_DIR / "stats.json"
+
+_java_version = None
+
+def java_version() -> str:
+    """First line of java -version, e.g. 'openjdk version "17.0.9" 2023-10-17'"""
+    global _java_version
+    if _java_version is None:
+        try:
+            result = subprocess.run(["java", "-version"], capture_output=True, text=True)
+            _java_version = (result.stderr or result.stdout).strip().splitlines()[0]
+        except (OSError, IndexError):
+            _java_version = ""
+    return _java_version
+
+def java_major() -> int:
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', java_version())
+    if not match:
+        return 0
+    major = int(match.group(1))
+    # Java 8 and older report themselves as 1.x
+    return int(match.group(2) or 0) if major == 1 else major
+
+def archive_path(jar: Path | str) -> Path:
+    runtime = hashlib.sha256(java_version().encode()).hexdigest()[:12]
+    return CDS_DIR / f"{Path(jar).stem}-{utils.file_sha256(jar)[:16]}-{runtime}.jsa"
+
+def _load_stats() -> dict:
+    try:
+        with STATS_PATH.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_stats(stats: dict) -> None:
+    tmp_path = STATS_PATH.with_name(f"{STATS_PATH.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp_path, STATS_PATH)
+
+def measure(jar: Path | str, archive: Path, probe: list[str], rounds: int = 3) -> tuple[float, float]:
+    """Best-of-rounds wall time of a probe command without and with the archive"""
+    def timed(flags: list[str]) -> float:
+        start = time.monotonic()
+        subprocess.run(["java", *flags, "-jar", str(jar), *probe], capture_output=True)
+        return time.monotonic() - start
+
+    cold = min(timed(["-Xshare:off"]) for _ in range(rounds))
+    warm = min(timed([f"-XX:SharedArchiveFile={archive}"]) for _ in range(rounds))
+    return cold, warm
+
+def run(jar: Path | str, args: list[str], probe: list[str] = None, **kwargs) -> str | None:
+    """utils.run_process for 'java -jar', with a per-jar AppCDS archive.
+
+    The first run of a jar dumps the classes it loaded into an archive,
+    which every later run maps instead of loading and verifying them again.
+    When probe is given, the startup saving is measured once the archive exists.
+    """
+    jar = str(jar)
+    if java_major() < 13:
+        # Dynamic archives need JDK 13+
+        return utils.run_process(["java", "-jar", jar, *args], **kwargs)
+
+    archive = archive_path(jar)
+    if archive.exists():
+        return utils.run_process(["java", f"-XX:SharedArchiveFile={archive}", "-jar", jar, *args], **kwargs)
+
+    # Dump to a private file so concurrent builds never map a half-written archive
+    CDS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_archive = archive.with_name(f"{archive.stem}.{os.getpid()}.tmp.jsa")
+    try:
+        result = utils.run_process(["java", f"-XX:ArchiveClassesAtExit={tmp_archive}", "-jar", jar, *args], **kwargs)
+    finally:
+        if tmp_archive.exists():
+            os.replace(tmp_archive, archive)
+
+    if archive.exists():
+        logging.info(f"📦 Created CDS archive for {Path(jar).name}")
+        if probe:
+            cold, warm = measure(jar, archive, probe)
+            stats = _load_stats()
+            stats[archive.name] = {"tool": Path(jar).name, "java": java_version(), "cold": cold, "warm": warm}
+            _save_stats(stats)
+            logging.info(f"⏱️ {Path(jar).name} startup: {cold:.2f}s -> {warm:.2f}s with CDS (saved {cold - warm:.2f}s)")
+
+    return result
+
+def report() -> None:
+    """Log the measured startup saving of every archive for the current runtime"""
+    for name, entry in sorted(_load_stats().items()):
+        if entry.get("java") != java_version() or not (CDS_DIR / name).exists():
+            continue
+        saved = entry["cold"] - entry["warm"]
+        logging.info(
+            f"⏱️ CDS {entry['tool']}: {entry['cold']:.2f}s -> {entry['warm']:.2f}s "
+            f"({saved:.2f}s, {saved / entry['cold'] * 100 if entry['cold'] else 0:.0f}% faster startup)"
+        )
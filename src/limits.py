@@ -0,0 +1,147 @@
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Default per-host request concurrency for fleet builds, keyed by domain
+HOST_LIMITS = {
+    "apkmirror.com": 2,
+    "apkpure.net": 4,
+    "uptodown.com": 4,
+    "aptoide.com": 4,
+    "github.com": 8,
+    "githubusercontent.com": 8,
+    "*": 8
+}
+
+# Request budget per domain as (requests per second, burst size)
+HOST_RATES = {
+    "apkmirror.com": (0.5, 3)
+}
+
+# Semaphores shared between processes, installed by configure()
+_host_slots = {}
+_jvm_slots = None
+_held = threading.local()
+
+def configure(host_slots: dict, jvm_slots=None, buckets: dict = None) -> None:
+    global _host_slots, _jvm_slots
+    _host_slots = host_slots
+    _jvm_slots = jvm_slots
+    if buckets:
+        with _buckets_lock:
+            _buckets.update(buckets)
+
+def host_limits(overrides: list[str]) -> dict:
+    """HOST_LIMITS with DOMAIN=N overrides from the command line applied"""
+    limits = dict(HOST_LIMITS)
+    for override in overrides:
+        domain, _, value = override.partition("=")
+        limits[domain] = int(value)
+    return limits
+
+def host_key(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    domain = ".".join(host.split(".")[-2:])
+    return domain if domain in HOST_LIMITS else "*"
+
+@contextmanager
+def _acquire(key: str, semaphore):
+    held = getattr(_held, "keys", None)
+    if held is None:
+        held = _held.keys = set()
+
+    # Reentrant per thread, so nested requests to the same host never deadlock
+    if semaphore is None or key in held:
+        yield
+        return
+
+    semaphore.acquire()
+    held.add(key)
+    try:
+        yield
+    finally:
+        held.discard(key)
+        semaphore.release()
+
+class Cancelled(BaseException):
+    """Raised at the next request of a thread whose cancel scope is set.
+
+    A BaseException, so the scrapers' broad except Exception handlers do not
+    retry or drop their cached state for a lookup that simply lost a race.
+    """
+
+@contextmanager
+def cancel_scope(event: threading.Event):
+    """Make every request of this thread raise Cancelled once event is set"""
+    previous = getattr(_held, "cancel", None)
+    _held.cancel = event
+    try:
+        yield
+    finally:
+        _held.cancel = previous
+
+def check_cancelled() -> None:
+    event = getattr(_held, "cancel", None)
+    if event is not None and event.is_set():
+        raise Cancelled("cancelled by the caller")
+
+@contextmanager
+def host_slot(url: str):
+    check_cancelled()
+    key = host_key(url)
+    with _acquire(key, _host_slots.get(key)):
+        # The wait for a slot may have outlasted the lookup
+        check_cancelled()
+        yield
+
+def jvm_slot():
+    return _acquire("jvm", _jvm_slots)
+
+class TokenBucket:
+    """Allows bursts of up to capacity requests, refilled at rate per second.
+
+    The state lives in a plain dict guarded by a thread lock unless a Manager
+    dict and lock are passed, which fleet does so its workers share one budget.
+    """
+    def __init__(self, rate: float, capacity: int, state=None, lock=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.state = state if state is not None else {}
+        self.state.update(tokens=float(capacity), updated=time.monotonic())
+        self.lock = lock or threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping only if the budget is exhausted. Returns the time waited."""
+        with self.lock:
+            # CLOCK_MONOTONIC is system-wide, so timestamps agree across processes
+            now = time.monotonic()
+            tokens = min(self.capacity, self.state["tokens"] + (now - self.state["updated"]) * self.rate) - 1
+            self.state.update(tokens=tokens, updated=now)
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+def shared_buckets(manager) -> dict:
+    """A bucket per HOST_RATES domain whose state lives in manager, for configure()"""
+    return {
+        domain: TokenBucket(rate, capacity, manager.dict(), manager.Lock())
+        for domain, (rate, capacity) in HOST_RATES.items()
+    }
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def throttle(url: str) -> float:
+    """Wait for the request budget of the url's host, if it has one"""
+    check_cancelled()
+    host = urlparse(url).hostname or ""
+    domain = ".".join(host.split(".")[-2:])
+    if domain not in HOST_RATES:
+        return 0.0
+
+    with _buckets_lock:
+        if domain not in _buckets:
+            _buckets[domain] = TokenBucket(*HOST_RATES[domain])
+    return _buckets[domain].acquire()
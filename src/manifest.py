@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from src import session, utils, limits, downloader
+
+# What every published APK was built from, keyed by app/source/arch
+MANIFEST_FILE = Path(os.getenv("BUILD_MANIFEST", "manifest.json"))
+FRAGMENT_PATTERN = "manifest-*.json"
+# Apps checked at once by plan, each mirror still capped by its host limit
+PLAN_WORKERS = int(os.getenv("PLAN_WORKERS", "16"))
+
+_source_inputs = {}
+
+def entry_key(app_name: str, source: str, arch: str) -> str:
+    return f"{app_name}/{source}/{arch}"
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def load(path: Path = MANIFEST_FILE) -> dict:
+    try:
+        with path.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"entries": {}}
+
+def save(manifest: dict, path: Path = MANIFEST_FILE) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def source_inputs(source: str) -> dict:
+    """Release tags (or bundle digest) that decide which patches and CLI a source builds with"""
+    if source not in _source_inputs:
+        with (Path("sources") / f"{source}.json").open() as f:
+            info = json.load(f)
+
+        if isinstance(info, dict) and "bundle_url" in info:
+            with session.get(info["bundle_url"]) as res:
+                res.raise_for_status()
+                bundle = res.text
+            cli = info.get("cli", {})
+            cli_release = utils.detect_github_release(
+                cli.get("user", "revanced"), cli.get("repo", "revanced-cli"), cli.get("tag", "latest")
+            )
+            inputs = {"bundle": _sha256_text(bundle), "cli": cli_release["tag_name"]}
+        else:
+            inputs = {
+                f"{repo_info['user']}/{repo_info['repo']}": utils.detect_github_release(
+                    repo_info["user"], repo_info["repo"], repo_info["tag"]
+                )["tag_name"]
+                for repo_info in info[1:]
+            }
+        _source_inputs[source] = inputs
+    return _source_inputs[source]
+
+def app_inputs(app_name: str, source: str) -> dict:
+    """Digests of the patch selection and every mirror config of an app"""
+    selection = Path("patches") / f"{app_name}-{source}.txt"
+    configs = {
+        platform: downloader.load_platform_config(app_name, platform)
+        for platform in downloader.MIRRORS
+    }
+    return {
+        "patch_selection": utils.file_sha256(selection) if selection.exists() else None,
+        "app_configs": _sha256_text(json.dumps(configs, sort_keys=True))
+    }
+
+def current_inputs(app_name: str, source: str) -> dict:
+    return {"source": source_inputs(source), "app": app_inputs(app_name, source)}
+
+def follows_latest(app_name: str, cli: str, patches: str) -> bool:
+    """True when neither a config nor the patches pin the stock version, so it tracks the mirrors"""
+    configs = [c for c in (downloader.load_platform_config(app_name, p) for p in downloader.MIRRORS) if c]
+    if not configs or any(c.get("version") for c in configs):
+        return False
+    return downloader.get_supported_version(configs[0]["package"], cli, patches) is None
+
+def latest_stock_version(app_name: str, platform: str = None) -> str | None:
+    """Latest version of an app on the given mirror, or on the first one that answers"""
+    for mirror in [platform] if platform else downloader.MIRRORS:
+        config = downloader.load_platform_config(app_name, mirror)
+        if config is None:
+            continue
+        try:
+            return getattr(downloader, mirror).get_latest_version(app_name, config)
+        except (Exception, SystemExit) as e:
+            logging.warning(f"{mirror}: could not check latest {app_name}: {e}")
+    return None
+
+def record(app_name: str, source: str, arch: str, apk: Path | str, cli: Path, patches: Path,
+           stock_version: str, stock_sha256: str, tracks_latest: bool, platform: str = None) -> None:
+    """Add one built APK to this build's manifest fragment, merged into the manifest at release time"""
+    fragment_path = Path(f"manifest-{app_name}-{source}.json")
+    fragment = load(fragment_path)
+    fragment["entries"][entry_key(app_name, source, arch)] = {
+        "app_name": app_name,
+        "source": source,
+        "arch": arch,
+        "apk": Path(apk).name,
+        "stock_version": stock_version,
+        "stock_sha256": stock_sha256,
+        "follows_latest": tracks_latest,
+        # Mirrors disagree on the newest version, so staleness is checked where the build got it
+        "platform": platform,
+        "patches": Path(patches).name,
+        "cli": Path(cli).name,
+        "inputs": current_inputs(app_name, source)
+    }
+    save(fragment, fragment_path)
+
+def stale_arches(app_name: str, source: str, arches: list[str], manifest: dict) -> list[str]:
+    """Arches of an app whose published APK no longer matches the current inputs"""
+    try:
+        inputs = current_inputs(app_name, source)
+    except Exception as e:
+        logging.warning(f"Could not resolve inputs of {app_name} ({source}), rebuilding: {e}")
+        return arches
+
+    latest = {}
+    stale = []
+    for arch in arches:
+        entry = manifest["entries"].get(entry_key(app_name, source, arch))
+        if entry is None or entry["inputs"] != inputs:
+            stale.append(arch)
+            continue
+        if entry.get("follows_latest"):
+            # Only unpinned apps need a mirror lookup, once per mirror for all of their arches
+            platform = entry.get("platform")
+            if platform not in latest:
+                latest[platform] = latest_stock_version(app_name, platform)
+            if latest[platform] != entry["stock_version"]:
+                stale.append(arch)
+    return stale
+
+def _prefetch_source_inputs(source: str) -> None:
+    try:
+        source_inputs(source)
+    except Exception:
+        # stale_arches reports it and rebuilds the source's apps
+        pass
+
+def plan(manifest: dict, force: bool = False) -> list[dict]:
+    """Build matrix entries (app_name, source, arches) that need rebuilding.
+
+    Every app is checked concurrently. Only release tags and the mirrors'
+    latest versions are fetched: supported versions can only change with
+    the patches, which are part of the inputs already.
+    """
+    from src.fleet import load_builds
+
+    builds = load_builds()
+    if force:
+        stale_per_build = [arches for _, _, arches in builds]
+    else:
+        with ThreadPoolExecutor(max_workers=PLAN_WORKERS) as pool:
+            # Release tags first, so the app checks read them from the memo
+            list(pool.map(_prefetch_source_inputs, sorted({source for _, source, _ in builds})))
+            stale_per_build = list(pool.map(lambda build: stale_arches(*build, manifest), builds))
+
+    matrix = []
+    for (app_name, source, arches), stale in zip(builds, stale_per_build):
+        if stale:
+            logging.info(f"🔄 {app_name} ({source}): {', '.join(stale)} out of date")
+            matrix.append({"app_name": app_name, "source": source, "arches": ",".join(stale)})
+        else:
+            logging.info(f"✅ {app_name} ({source}): up to date")
+    return matrix
+
+def merge(manifest: dict, fragment_dir: Path, recursive: bool = True, remove: bool = False) -> tuple[dict, list[str]]:
+    """Fold build fragments into the manifest, returning it and the APK names they replace"""
+    replaced = []
+    fragments = fragment_dir.rglob(FRAGMENT_PATTERN) if recursive else fragment_dir.glob(FRAGMENT_PATTERN)
+    for fragment_path in sorted(fragments):
+        for key, entry in load(fragment_path)["entries"].items():
+            previous = manifest["entries"].get(key)
+            if previous and previous["apk"] != entry["apk"]:
+                replaced.append(previous["apk"])
+            manifest["entries"][key] = entry
+        if remove:
+            fragment_path.unlink()
+    return manifest, replaced
+
+def _write_output(name: str, value: str) -> None:
+    if "GITHUB_OUTPUT" in os.environ:
+        with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+            f.write(f"{name}={value}\n")
+    else:
+        print(f"{name}={value}")
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src plan", description="Emit the build matrix of out-of-date apps")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_FILE, help="manifest of the published APKs")
+    parser.add_argument("--output", type=Path, help="also write the matrix to this file")
+    parser.add_argument("--force", action="store_true", help="rebuild everything")
+    parser.add_argument("--merge", type=Path, metavar="DIR",
+                        help="merge the build fragments under DIR into the manifest instead of planning")
+    parser.add_argument("--host-limit", action="append", default=[], metavar="DOMAIN=N",
+                        help="override a per-host request limit, e.g. apkmirror.com=1")
+    options = parser.parse_args(args)
+
+    manifest = load(options.manifest)
+    if options.merge:
+        manifest, replaced = merge(manifest, options.merge)
+        save(manifest, options.manifest)
+        logging.info(f"📒 Manifest now lists {len(manifest['entries'])} APKs, {len(replaced)} replaced")
+        _write_output("replaced", " ".join(replaced))
+        return
+
+    # One process, so plain semaphores do what fleet's managed ones do across workers
+    limits.configure({
+        domain: threading.BoundedSemaphore(n) for domain, n in limits.host_limits(options.host_limit).items()
+    })
+    matrix = plan(manifest, force=options.force)
+    if options.output:
+        options.output.write_text(json.dumps(matrix))
+    logging.info(f"📋 {len(matrix)} builds out of date")
+    _write_output("has_updates", "true" if matrix else "false")
+    _write_output("matrix", json.dumps(matrix))
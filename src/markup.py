@@ -0,0 +1,24 @@
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml builds the same tree several times faster, fall back to the stdlib parser without it
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+logging.debug(f"HTML parser backend: {PARSER}")
+
+# The nodes each scraper needs, everything else is skipped while parsing
+APKMIRROR_APP_ROWS = SoupStrainer("div", class_="appRow")
+LINKS = SoupStrainer("a", href=True)
+APKPURE_VERSION = SoupStrainer("div", class_="ver-top-down")
+APKPURE_DOWNLOAD_LINK = SoupStrainer("a", id="download_link")
+UPTODOWN_VERSIONS = SoupStrainer(id="versions-items-list")
+UPTODOWN_APP_NAME = SoupStrainer("h1", id="detail-app-name")
+UPTODOWN_DOWNLOAD_BUTTON = SoupStrainer("button", id="detail-download-button")
+
+def parse(markup: str | bytes, only: SoupStrainer = None) -> BeautifulSoup:
+    """Parse a page, building only the subtrees matched by the strainer"""
+    return BeautifulSoup(markup, PARSER, parse_only=only)
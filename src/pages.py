@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from src import cache_dir, limits
+
+# Scraped pages are reused for PAGE_TTL seconds, then revalidated with a conditional GET
+PAGES_DIR = Path(cache_dir) / "pages"
+PAGE_TTL = int(os.getenv("PAGE_CACHE_TTL", "600"))
+
+_pages = {}
+_pages_lock = threading.Lock()
+
+def _page_path(url: str) -> Path:
+    return PAGES_DIR / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+def _load(url: str) -> dict | None:
+    try:
+        with _page_path(url).open() as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("url") == url else None
+
+def _save(entry: dict) -> None:
+    PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    path = _page_path(entry["url"])
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def fetch(client, url: str, ttl: int = PAGE_TTL) -> str | None:
+    """GET a page at most once per run, and revalidate it cheaply on later runs.
+
+    client is any requests-compatible session. Returns the page text, or
+    None when the server answers with an error status.
+    """
+    with _pages_lock:
+        if url in _pages:
+            return _pages[url]
+
+    entry = _load(url)
+    if entry and time.time() - entry["fetched_at"] < ttl:
+        logging.info(f"Page cache hit: {url}")
+        with _pages_lock:
+            _pages[url] = entry["text"]
+        return entry["text"]
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    with limits.host_slot(url):
+        limits.throttle(url)
+        response = client.get(url, headers=headers)
+
+    if response.status_code == 304 and entry:
+        logging.info(f"Page not modified: {url}")
+        entry["fetched_at"] = time.time()
+    elif response.status_code == 200:
+        response.encoding = 'utf-8'
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "text": response.text
+        }
+    else:
+        logging.error(f"{url} failed: {response.status_code}")
+        return None
+
+    _save(entry)
+    with _pages_lock:
+        _pages[url] = entry["text"]
+    return entry["text"]
@@ -1,41 +1,126 @@
 import os
 import boto3
 import logging
+import threading
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
+from botocore.exceptions import ClientError
 from datetime import (
-    datetime, 
-    timezone, 
+    datetime,
+    timezone,
     timedelta
 )
 from src import (
-    bucket_name, 
-    endpoint_url, 
-    access_key_id, 
+    utils,
+    bucket_name,
+    endpoint_url,
+    access_key_id,
     secret_access_key
 )
 
-def delete_old_files(s3, bucket_name, prefix, threshold_minutes=60):
-    objects = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+# Large APKs go up in parallel parts, small ones in a single PUT
+UPLOAD_CONCURRENCY = int(os.getenv("R2_UPLOAD_CONCURRENCY", "8"))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=UPLOAD_CONCURRENCY,
+    use_threads=True
+)
+DELETE_BATCH = 1000
+
+_client = None
+_client_lock = threading.Lock()
+# Each prefix is listed once per run: key -> LastModified, and the keys
+# uploaded or skipped since, which prune() keeps
+_listings = {}
+_kept = {}
+_listing_lock = threading.Lock()
+
+def client():
+    """One S3 client for the whole run; ENDPOINT_URL may point at any S3-compatible server"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = boto3.client('s3',
+                                   endpoint_url=endpoint_url,
+                                   aws_access_key_id=access_key_id,
+                                   aws_secret_access_key=secret_access_key,
+                                   config=Config(
+                                       signature_version='s3v4',
+                                       max_pool_connections=UPLOAD_CONCURRENCY * 2,
+                                       retries={'max_attempts': 5, 'mode': 'adaptive'}
+                                   ))
+        return _client
+
+def _list(s3, bucket_name, prefix):
+    objects = {}
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects[obj['Key']] = obj['LastModified']
+    return objects
+
+def _delete(s3, bucket_name, prefix, keys):
+    for start in range(0, len(keys), DELETE_BATCH):
+        batch = keys[start:start + DELETE_BATCH]
+        result = s3.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        for error in result.get('Errors', []):
+            logging.warning(f"Could not delete {error['Key']}: {error.get('Message')}")
+        logging.info(f"Deleted {len(batch) - len(result.get('Errors', []))} old files under {prefix}")
 
-    if 'Contents' in objects:
-        for obj in objects['Contents']:
-            last_modified = obj['LastModified']
-            age = datetime.now(timezone.utc) - last_modified
+def _stale(objects, threshold_minutes, keep):
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=threshold_minutes)
+    return [key for key, modified in objects.items() if modified < cutoff and key not in keep]
 
-            if age > timedelta(minutes=threshold_minutes):
-                s3.delete_object(Bucket=bucket_name, Key=obj['Key'])
-                logging.info(f"Deleted old file: {obj['Key']}")
+def delete_old_files(s3, bucket_name, prefix, threshold_minutes=60, keep=()):
+    """Delete objects under prefix older than the threshold, in batches of up to 1000 keys"""
+    _delete(s3, bucket_name, prefix, _stale(_list(s3, bucket_name, prefix), threshold_minutes, keep))
+
+def _listing(s3, prefix):
+    with _listing_lock:
+        if prefix not in _listings:
+            _listings[prefix] = _list(s3, bucket_name, prefix)
+            _kept[prefix] = set()
+        return _listings[prefix]
+
+def _remote_sha256(s3, key):
+    try:
+        head = s3.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return head.get('Metadata', {}).get('sha256')
 
 def upload(file_path, key):
-    s3 = boto3.client('s3',
-                      endpoint_url=endpoint_url,
-                      aws_access_key_id=access_key_id,
-                      aws_secret_access_key=secret_access_key,
-                      config=Config(signature_version='s3v4'))
+    """Upload unless the stored object has the same sha256; call prune() once all uploads are done"""
+    s3 = client()
+    digest = utils.file_sha256(file_path)
+    prefix = key.rsplit('/', 1)[0]
 
-    delete_old_files(s3, bucket_name, key.rsplit('/', 1)[0])
+    # Only keys in the listing can match, so new keys need no HEAD
+    unchanged = key in _listing(s3, prefix) and _remote_sha256(s3, key) == digest
+    with _listing_lock:
+        _kept[prefix].add(key)
 
-    with open(file_path, 'rb') as file:
-        s3.upload_fileobj(file, bucket_name, key)
+    if unchanged:
+        logging.info(f"Upload skipped, same content already stored: {key}")
+        return
+
+    s3.upload_file(
+        str(file_path), bucket_name, key,
+        ExtraArgs={'Metadata': {'sha256': digest}},
+        Config=TRANSFER_CONFIG
+    )
 
     logging.info(f"Upload success: {key}")
+
+def prune(threshold_minutes=60):
+    """Delete old objects under every prefix uploaded to, keeping each key uploaded or skipped this run"""
+    s3 = client()
+    with _listing_lock:
+        listings = [(prefix, objects, set(_kept[prefix])) for prefix, objects in _listings.items()]
+    for prefix, objects, keep in listings:
+        _delete(s3, bucket_name, prefix, _stale(objects, threshold_minutes, keep))
@@ -1,8 +1,16 @@
 import re
-import json
+import time
+import logging
 from sys import exit
 from pathlib import Path
-from src import repository, gh
+from concurrent.futures import ThreadPoolExecutor
+from src import repository, utils
+from src.github_api import api, API_URL
+
+# Release assets are uploaded on a few connections, retrying transient failures
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3
+APK_CONTENT_TYPE = 'application/vnd.android.package-archive'
 
 def convert_title(text):
     if not text or not isinstance(text, str):
@@ -22,51 +30,8 @@ def extract_version(file_path):
     match = re.search(r'(\d+\.\d+\.\d+(-[a-z]+\.\d+)?(-release\d*)?)', base_name)
     return match.group(1) if match else 'unknown'
 
-def create_github_release(name, patches_name, cli_name, apk_file_path):
-    patchver = extract_version(patches_name)
-    cliver = extract_version(cli_name)
-    tag_name = f"{name}-v{patchver}"
-
-    apk_path = Path(apk_file_path)
-    if not apk_path.exists():
-        exit(1)
-
-    repo = gh.get_repo(repository)
-
-    # Step 1: Check for existing release with the exact tag name
-    try:
-        existing_release = repo.get_release(tag_name)
-    except:
-        existing_release = None
-
-    # Step 2: Delete existing assets if same APK already uploaded
-    if existing_release:
-        for asset in existing_release.get_assets():
-            if asset.name == apk_path.name:
-                asset.delete_asset()
-
-    # Step 3: Delete old releases with the same base name and matching version suffix
-    releases = list(repo.get_releases())
-
-    suffix_match = re.search(r'(-[a-z]+\.\d+)$', patchver)
-    current_suffix = suffix_match.group(1) if suffix_match else ''
-
-    for release in releases:
-        release_tag = release.tag_name
-        if release_tag.startswith(f"{name}-v") and release_tag != tag_name:
-            old_version = release_tag[len(name) + 2:]
-            old_suffix_match = re.search(r'(-[a-z]+\.\d+)$', old_version)
-            old_suffix = old_suffix_match.group(1) if old_suffix_match else ''
-
-            if old_suffix == current_suffix:
-                old_numeric = re.sub(r'(-[a-z]+\.\d+)?(-release\d*)?$', '', old_version)
-                current_numeric = re.sub(r'(-[a-z]+\.\d+)?(-release\d*)?$', '', patchver)
-                if old_numeric < current_numeric:
-                    release.delete_release()
-
-    # Step 4: Create new release if it doesn't exist
-    if not existing_release:
-        release_body = f"""\
+def _release_body(patchver, cliver):
+    return f"""\
 # Release Notes
 
 ## Build Tools:
@@ -77,18 +42,140 @@ def create_github_release(name, patches_name, cli_name, apk_file_path):
 **ReVanced GmsCore** is **necessary** to work. 
 - Please **download** it from [HERE](https://github.com/revanced/gmscore/releases/latest).
 """
-        release_name = f"{convert_title(name)} v{patchver}"
-        existing_release = repo.create_git_release(
-            tag=tag_name,
-            name=release_name,
-            message=release_body,
-            draft=False,
-            prerelease=False
-        )
-
-    # Step 5: Upload APK
-    existing_release.upload_asset(
-        path=str(apk_path),
-        label=apk_path.name,
-        content_type='application/vnd.android.package-archive'
+
+def _version_suffix(version):
+    match = re.search(r'(-[a-z]+\.\d+)$', version)
+    return match.group(1) if match else ''
+
+def _numeric_version(version):
+    return re.sub(r'(-[a-z]+\.\d+)?(-release\d*)?$', '', version)
+
+def _is_superseded(release_tag, name, tag_name, patchver):
+    """Older release of the same app on the same channel (stable, dev, ...)"""
+    if not release_tag.startswith(f"{name}-v") or release_tag == tag_name:
+        return False
+    old_version = release_tag[len(name) + 2:]
+    if _version_suffix(old_version) != _version_suffix(patchver):
+        return False
+    return utils.normalize_version(_numeric_version(old_version)) < utils.normalize_version(_numeric_version(patchver))
+
+def _asset_matches(asset, apk_path):
+    """Same size and the same sha256 GitHub reports for the uploaded asset"""
+    if asset.get("state", "uploaded") != "uploaded" or asset.get("size") != apk_path.stat().st_size:
+        return False
+    return asset.get("digest") == f"sha256:{utils.file_sha256(apk_path)}"
+
+def _api(method, path, **kwargs):
+    response = api.request(method, path if path.startswith("http") else f"{API_URL}{path}", **kwargs)
+    response.raise_for_status()
+    return response.json() if response.content else None
+
+def list_releases():
+    """Every release of the repository, with its assets, in one paginated listing"""
+    releases = []
+    page = 1
+    while True:
+        batch = _api("GET", f"/repos/{repository}/releases?per_page=100&page={page}")
+        releases += batch
+        if len(batch) < 100:
+            return releases
+        page += 1
+
+def plan_release(builds, releases):
+    """Diff the built APKs against the existing releases.
+
+    builds is a list of dicts with name, patches_name, cli_name and apk.
+    Returns the releases to create and delete and the assets to upload,
+    replace or skip.
+    """
+    by_tag = {release["tag_name"]: release for release in releases}
+    plan = {"create": {}, "delete": {}, "upload": [], "skip": []}
+
+    for build in builds:
+        name = build["name"]
+        apk_path = Path(build["apk"])
+        patchver = extract_version(build["patches_name"])
+        tag_name = f"{name}-v{patchver}"
+
+        existing = by_tag.get(tag_name)
+        if not existing and tag_name not in plan["create"]:
+            plan["create"][tag_name] = {
+                "tag_name": tag_name,
+                "name": f"{convert_title(name)} v{patchver}",
+                "body": _release_body(patchver, extract_version(build["cli_name"])),
+                "draft": False,
+                "prerelease": False
+            }
+
+        for release in releases:
+            if _is_superseded(release["tag_name"], name, tag_name, patchver):
+                plan["delete"][release["tag_name"]] = release
+
+        asset = next((a for a in (existing or {}).get("assets", []) if a["name"] == apk_path.name), None)
+        if asset and _asset_matches(asset, apk_path):
+            plan["skip"].append((tag_name, apk_path))
+        else:
+            plan["upload"].append((tag_name, apk_path, asset))
+
+    # A release this batch publishes to is never stale
+    for tag_name in {tag for tag, _, _ in plan["upload"]} | {tag for tag, _ in plan["skip"]}:
+        plan["delete"].pop(tag_name, None)
+    return plan
+
+def _upload(release, apk_path, replaced):
+    upload_url = release["upload_url"].split("{")[0]
+    for attempt in range(UPLOAD_RETRIES):
+        try:
+            if replaced:
+                _api("DELETE", f"/repos/{repository}/releases/assets/{replaced['id']}")
+                replaced = None
+            with apk_path.open("rb") as f:
+                asset = _api(
+                    "POST", upload_url, params={"name": apk_path.name, "label": apk_path.name}, data=f,
+                    headers={"Content-Type": APK_CONTENT_TYPE, "Content-Length": str(apk_path.stat().st_size)}
+                )
+            logging.info(f"⬆️ Uploaded {apk_path.name} to {release['tag_name']}")
+            return asset
+        except Exception as e:
+            logging.warning(f"Upload of {apk_path.name} failed (attempt {attempt + 1}): {e}")
+            if attempt == UPLOAD_RETRIES - 1:
+                raise
+            # A failed upload can leave a broken asset behind that blocks the name
+            assets = _api("GET", f"/repos/{repository}/releases/{release['id']}/assets?per_page=100")
+            replaced = next((a for a in assets if a["name"] == apk_path.name), None)
+            time.sleep(2 ** attempt)
+
+def publish(builds):
+    """Publish every built APK with one release listing and parallel uploads"""
+    releases = list_releases()
+    plan = plan_release(builds, releases)
+    logging.info(
+        f"📋 Release plan: {len(plan['create'])} to create, {len(plan['delete'])} to delete, "
+        f"{len(plan['upload'])} uploads, {len(plan['skip'])} unchanged"
     )
+
+    by_tag = {release["tag_name"]: release for release in releases}
+    for tag_name, release in plan["delete"].items():
+        _api("DELETE", f"/repos/{repository}/releases/{release['id']}")
+        logging.info(f"🗑️ Deleted superseded release {tag_name}")
+    for tag_name, payload in plan["create"].items():
+        by_tag[tag_name] = _api("POST", f"/repos/{repository}/releases", json=payload)
+        logging.info(f"🚀 Created release {tag_name}")
+    for tag_name, apk_path in plan["skip"]:
+        logging.info(f"⏭️ {apk_path.name} already published in {tag_name}")
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        futures = [
+            pool.submit(_upload, by_tag[tag_name], apk_path, replaced)
+            for tag_name, apk_path, replaced in plan["upload"]
+        ]
+        for future in futures:
+            future.result()
+    return plan
+
+def create_github_release(name, patches_name, cli_name, apk_file_path):
+    apk_path = Path(apk_file_path)
+    if not apk_path.exists():
+        exit(1)
+
+    publish([{"name": name, "patches_name": patches_name, "cli_name": cli_name, "apk": apk_path}])
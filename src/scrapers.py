@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+import cloudscraper
+from pathlib import Path
+from urllib.parse import urlparse
+from requests.cookies import create_cookie
+from src import cache_dir, session, trace
+
+# Cookie jars (including Cloudflare clearance) persisted per host, shared by every build on this machine
+COOKIES_DIR = Path(cache_dir) / "cookies"
+
+_scrapers = {}
+_lock = threading.Lock()
+
+def _cookie_path(host: str) -> Path:
+    return COOKIES_DIR / f"{host}.json"
+
+def _load_cookies(scraper, host: str) -> None:
+    try:
+        with _cookie_path(host).open() as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    # Clearance cookies are only honoured together with the User-Agent that earned them
+    if saved.get("user_agent"):
+        scraper.headers["User-Agent"] = saved["user_agent"]
+
+    now = time.time()
+    for cookie in saved.get("cookies", []):
+        if cookie.get("expires") and cookie["expires"] < now:
+            continue
+        scraper.cookies.set_cookie(create_cookie(**cookie))
+
+def save_cookies(host: str) -> None:
+    scraper = _scrapers.get(host)
+    if scraper is None:
+        return
+
+    cookies = [
+        {
+            "name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+            "expires": c.expires, "secure": c.secure
+        }
+        for c in scraper.cookies
+        if not c.expires or c.expires > time.time()
+    ]
+
+    COOKIES_DIR.mkdir(parents=True, exist_ok=True)
+    path = _cookie_path(host)
+    # Serialize writers from parallel builds
+    with open(path.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"user_agent": scraper.headers.get("User-Agent"), "cookies": cookies}, f)
+        os.replace(tmp_path, path)
+
+def get(url: str):
+    """Return the pooled scraper for a URL's host, creating it on first use"""
+    host = urlparse(url).hostname or url
+    with _lock:
+        if host not in _scrapers:
+            scraper = cloudscraper.create_scraper()
+            _load_cookies(scraper, host)
+
+            def persist(response, *args, **kwargs):
+                if response.cookies:
+                    try:
+                        save_cookies(host)
+                    except OSError as e:
+                        logging.warning(f"Could not save cookies for {host}: {e}")
+
+            scraper.hooks["response"].append(persist)
+            scraper.hooks["response"].append(trace.count_response)
+            _scrapers[host] = scraper
+        return _scrapers[host]
+
+def session_for(url: str):
+    """Pooled scraper if one exists for the URL's host, so downloads reuse its cookies and connections"""
+    return _scrapers.get(urlparse(url).hostname or "", session)
@@ -0,0 +1,36 @@
+import hashlib
+import logging
+from pathlib import Path
+from src import cache, jvm, trace, utils, downloader, apkeditor_tag
+
+# Bump when the merged output changes, so cached merges are rebuilt
+MERGE_VERSION = 3
+
+def merge_with_apkeditor(bundle: Path, dest: Path) -> None:
+    apk_editor = downloader.download_apkeditor()
+    jvm.run(apk_editor, [
+        "m",
+        "-i", str(bundle),
+        "-o", str(dest)
+    ], probe=["-h"], silent=True)
+    if not dest.exists():
+        raise RuntimeError("APKEditor did not produce a merged APK")
+
+def merge(bundle: Path) -> Path:
+    """Merge a split bundle into <bundle>.apk with APKEditor, reusing an earlier merge of the same bundle"""
+    dest = bundle.with_suffix(".apk")
+    # The pinned APKEditor release is part of the key, so a new pin merges again
+    basis = f"merge:{MERGE_VERSION}:{apkeditor_tag}:{utils.file_sha256(bundle)}"
+    key = hashlib.sha256(basis.encode()).hexdigest()
+
+    cached = cache.lookup_key(key, label=dest.name)
+    if cached:
+        cache.link_into(cached, dest)
+        logging.info(f"Reused merged APK: {dest.name}")
+        return dest
+
+    with trace.span("merge", input=bundle.name):
+        merge_with_apkeditor(bundle, dest)
+
+    cache.store_key(key, dest, dest.name)
+    return dest
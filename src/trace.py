@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import logging
+import resource
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+# One trace per build, written to TRACE_DIR; TRACE_CHROME=1 adds a chrome://tracing export
+DEFAULT_TRACE_DIR = "traces"
+
+_spans = []
+_lock = threading.Lock()
+_local = threading.local()
+_origin = time.monotonic()
+_bytes = 0
+
+def reset() -> None:
+    """Start a new trace, e.g. at the beginning of each build"""
+    global _origin, _bytes
+    with _lock:
+        _spans.clear()
+        _origin = time.monotonic()
+        _bytes = 0
+
+def add_bytes(count: int) -> None:
+    """Count bytes transferred, attributed to every span open at the time"""
+    global _bytes
+    with _lock:
+        _bytes += count
+
+def count_response(response, *args, stream: bool = False, **kwargs) -> None:
+    """requests response hook counting every buffered body; streamed ones are counted by their reader"""
+    if not stream:
+        add_bytes(len(response.content))
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _peak_rss_kb() -> int:
+    # ru_maxrss is in KiB on Linux and never goes down; children cover the JVMs we spawn
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+def current() -> str | None:
+    """Name of this thread's innermost open span, to hand to spans in worker threads"""
+    stack = _local.__dict__.get("stack")
+    return stack[-1] if stack else None
+
+@contextmanager
+def span(name: str, parent: str = None, **attrs):
+    """Time a build stage: wall time, child CPU time, bytes transferred and memory.
+
+    Spans nest per thread; the first span of a worker thread takes parent
+    instead, see current(). attrs are stored with the span and can be
+    extended inside the block through the yielded dict.
+
+    process_peak_rss_kb is the process-wide high-water mark when the span
+    ends, so it repeats for every later span; rss_growth_kb is how far the
+    span itself raised it.
+    """
+    stack = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else parent
+    record = {"name": name, "parent": parent, "thread": threading.current_thread().name, "attrs": dict(attrs)}
+    stack.append(name)
+
+    start = time.monotonic()
+    cpu_start = _children_cpu()
+    thread_cpu_start = time.thread_time()
+    rss_start = _peak_rss_kb()
+    with _lock:
+        bytes_start = _bytes
+    try:
+        yield record["attrs"]
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        end = time.monotonic()
+        peak_rss_kb = _peak_rss_kb()
+        with _lock:
+            record.update(
+                start=round(start - _origin, 6),
+                wall=round(end - start, 6),
+                cpu_children=round(_children_cpu() - cpu_start, 6),
+                cpu_thread=round(time.thread_time() - thread_cpu_start, 6),
+                bytes=_bytes - bytes_start,
+                process_peak_rss_kb=peak_rss_kb,
+                rss_growth_kb=peak_rss_kb - rss_start
+            )
+            _spans.append(record)
+
+def spans() -> list[dict]:
+    with _lock:
+        return sorted(_spans, key=lambda s: s["start"])
+
+def chrome_trace(records: list[dict]) -> dict:
+    """Spans as complete events for chrome://tracing or Perfetto"""
+    threads = {}
+    events = []
+    for record in records:
+        tid = threads.setdefault(record["thread"], len(threads))
+        events.append({
+            "name": record["name"], "ph": "X", "pid": os.getpid(), "tid": tid,
+            "ts": int(record["start"] * 1e6), "dur": int(record["wall"] * 1e6),
+            "args": {key: value for key, value in record.items() if key not in ("name", "start", "wall", "thread")}
+        })
+    events += [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread}}
+        for thread, tid in threads.items()
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def save(name: str) -> Path | None:
+    """Write the current trace as TRACE_DIR/trace-<name>.json and log a per-stage summary"""
+    records = spans()
+    if not records:
+        return None
+
+    trace_dir = Path(os.getenv("TRACE_DIR", DEFAULT_TRACE_DIR))
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    path = trace_dir / f"trace-{name}.json"
+    path.write_text(json.dumps({"name": name, "spans": records}, indent=2))
+    if os.getenv("TRACE_CHROME") == "1":
+        path.with_name(f"trace-{name}.chrome.json").write_text(json.dumps(chrome_trace(records)))
+
+    for record in records:
+        if record["parent"] is None or record["parent"] == "build":
+            logging.info(
+                f"⏱️ {record['name']}: {record['wall']:.2f}s wall, {record['cpu_children']:.2f}s child CPU, "
+                f"{record['bytes'] / 1024 / 1024:.1f} MiB, process peak RSS "
+                f"{record['process_peak_rss_kb'] / 1024:.0f} MiB (+{record['rss_growth_kb'] / 1024:.0f} MiB)"
+            )
+    logging.info(f"Trace written to {path}")
+    return path
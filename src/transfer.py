@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import ExitStack
+from src import utils, limits, trace, scrapers
+
+# Files at least this large are fetched over several ranged connections
+CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "4"))
+RANGED_MIN_SIZE = 16 * 1024 * 1024
+SEGMENT_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+WRITE_BUFFER = 4 * 1024 * 1024
+TIMEOUT = (15, 60)
+RETRIES = 5
+
+def _part_paths(filepath: Path) -> tuple[Path, Path]:
+    return filepath.with_name(filepath.name + ".part"), filepath.with_name(filepath.name + ".part.json")
+
+def _load_state(state_path: Path, identity: dict) -> dict:
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return state if state.get("identity") == identity else {}
+
+def _save_state(state_path: Path, state: dict) -> None:
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, state_path)
+
+def _backoff(attempt: int) -> None:
+    time.sleep(min(2 ** attempt, 30))
+
+def _download_ranged(url: str, part_path: Path, state_path: Path, total_size: int, state: dict) -> None:
+    """Fetch missing segments into a preallocated .part file over several connections"""
+    segments = [(start, min(start + SEGMENT_SIZE, total_size) - 1) for start in range(0, total_size, SEGMENT_SIZE)]
+    done = set(state.setdefault("done", []))
+    pending = [index for index in range(len(segments)) if index not in done]
+    if done:
+        logging.info(f"Resuming {part_path.name}: {len(done)}/{len(segments)} segments already on disk")
+
+    if not part_path.exists() or part_path.stat().st_size != total_size:
+        with part_path.open("wb") as file:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(file.fileno(), 0, total_size)
+            else:
+                file.truncate(total_size)
+
+    lock = threading.Lock()
+    errors = []
+
+    def worker() -> None:
+        with part_path.open("r+b", buffering=WRITE_BUFFER) as file:
+            while True:
+                with lock:
+                    if not pending or errors:
+                        return
+                    index = pending.pop(0)
+                start, end = segments[index]
+
+                for attempt in range(RETRIES):
+                    try:
+                        headers = {"Range": f"bytes={start}-{end}"}
+                        # Each connection holds its own slot for the whole segment body
+                        with limits.host_slot(url), \
+                                scrapers.session_for(url).get(url, headers=headers, stream=True, timeout=TIMEOUT) as res:
+                            if res.status_code != 206:
+                                raise IOError(f"expected 206 for range {start}-{end}, got {res.status_code}")
+                            file.seek(start)
+                            received = 0
+                            for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                                file.write(chunk)
+                                received += len(chunk)
+                            if received != end - start + 1:
+                                raise IOError(f"short read for range {start}-{end}: {received} bytes")
+                        file.flush()
+                        break
+                    except Exception as e:
+                        logging.warning(f"Segment {index} of {part_path.name} failed (attempt {attempt + 1}): {e}")
+                        if attempt == RETRIES - 1:
+                            with lock:
+                                errors.append(e)
+                            return
+                        _backoff(attempt)
+
+                with lock:
+                    done.add(index)
+                    state["done"] = sorted(done)
+                    _save_state(state_path, state)
+
+    threads = [threading.Thread(target=worker) for _ in range(min(CONNECTIONS, len(pending)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise IOError(f"Ranged download of {url} failed, partial file kept for resume: {errors[0]}")
+
+def _hash_file(path: Path):
+    hasher = hashlib.sha256()
+    with path.open("rb") as file:
+        for block in iter(lambda: file.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher
+
+def _download_stream(url: str, res, part_path: Path, total_size: int, resumable: bool, want_hash: bool, offset: int = 0):
+    """Single connection download that resumes from the .part size when the server allows it"""
+    hasher = None
+    if want_hash:
+        hasher = _hash_file(part_path) if offset else hashlib.sha256()
+
+    for attempt in range(RETRIES):
+        try:
+            if res is None:
+                headers = {"Range": f"bytes={offset}-"} if offset else {}
+                res = scrapers.session_for(url).get(url, headers=headers, stream=True, timeout=TIMEOUT)
+                res.raise_for_status()
+                if offset and res.status_code != 206:
+                    # Server ignored the range, start over
+                    offset = 0
+                    hasher = hashlib.sha256() if want_hash else None
+
+            with res, part_path.open("r+b" if offset else "wb", buffering=WRITE_BUFFER) as file:
+                if offset:
+                    file.seek(offset)
+                    file.truncate()
+                for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+                    offset += len(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+
+            if total_size and offset != total_size:
+                raise IOError(f"connection closed at {offset}/{total_size} bytes")
+            return hasher
+        except Exception as e:
+            logging.warning(f"Download of {part_path.name} interrupted (attempt {attempt + 1}): {e}")
+            res = None
+            if attempt == RETRIES - 1:
+                raise
+            if resumable and part_path.exists():
+                offset = part_path.stat().st_size
+                # Rehash what is on disk so the digest still covers the whole file
+                hasher = _hash_file(part_path) if want_hash else None
+            else:
+                offset = 0
+                hasher = hashlib.sha256() if want_hash else None
+            _backoff(attempt)
+
+def download(url: str, name: str = None, sha256: str = None, directory: Path = None) -> Path:
+    """Download url to name inside directory, over several ranged connections when the server supports it.
+
+    Interrupted downloads leave a .part file and a .part.json progress
+    record that the next call for the same URL resumes from.
+    """
+    start_time = time.monotonic()
+
+    # A single-connection download holds the host slot for the whole body, not just the headers
+    with ExitStack() as slot:
+        slot.enter_context(limits.host_slot(url))
+        res = scrapers.session_for(url).get(url, stream=True, timeout=TIMEOUT)
+        res.raise_for_status()
+        final_url = res.url
+
+        if not name:
+            name = utils.extract_filename(res, fallback_url=final_url)
+
+        filepath = Path(directory or ".") / name
+        part_path, state_path = _part_paths(filepath)
+        # Content-Length of an encoded body does not match the bytes we write
+        total_size = 0 if res.headers.get('content-encoding') else int(res.headers.get('content-length', 0))
+        resumable = res.headers.get('accept-ranges', '').lower() == 'bytes' and total_size > 0
+        identity = {"url": url, "size": total_size, "etag": res.headers.get('etag')}
+
+        hasher = None
+        state = _load_state(state_path, identity) if resumable else {}
+        if not state:
+            state_path.unlink(missing_ok=True)
+        state["identity"] = identity
+
+        if resumable and CONNECTIONS > 1 and total_size >= RANGED_MIN_SIZE:
+            res.close()
+            # The ranged workers take their own slots, holding this one as well would deadlock at a limit of 1
+            slot.close()
+            # Signed redirect targets are only valid for a while, so ranges go to the final URL
+            _download_ranged(final_url, part_path, state_path, total_size, state)
+            connections = CONNECTIONS
+        else:
+            offset = 0
+            if resumable:
+                if state.get("stream") and part_path.exists():
+                    offset = part_path.stat().st_size
+                    logging.info(f"Resuming {part_path.name} from byte {offset}")
+                    res.close()
+                    res = None
+                state["stream"] = True
+                _save_state(state_path, state)
+            hasher = _download_stream(url, res, part_path, total_size, resumable, bool(sha256), offset)
+            connections = 1
+
+    downloaded_size = part_path.stat().st_size
+    # Streamed, so trace.count_response leaves the body to us
+    trace.add_bytes(downloaded_size)
+    os.replace(part_path, filepath)
+    state_path.unlink(missing_ok=True)
+
+    elapsed = max(time.monotonic() - start_time, 1e-6)
+    logging.info(
+        f"URL: {final_url} [{downloaded_size}/{total_size}] -> \"{filepath}\" [{connections}] "
+        f"{downloaded_size / elapsed / 1024 / 1024:.1f} MiB/s"
+    )
+
+    if sha256:
+        if hasher is None:
+            # Ranged segments arrive out of order, so hash the assembled file once
+            hasher = _hash_file(filepath)
+        if hasher.hexdigest() != sha256:
+            filepath.unlink(missing_ok=True)
+            raise ValueError(f"Digest mismatch for {final_url}: expected sha256 {sha256}, got {hasher.hexdigest()}")
+
+    return filepath
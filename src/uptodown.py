@@ -1,94 +1,211 @@
+import os
+import re
+import json
+import fcntl
 import logging 
-from src import session 
-from bs4 import BeautifulSoup
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from src import utils, markup, session, cache_dir
+
+# Slug that resolved for each package, tried first on later runs
+INDEX_PATH = Path(cache_dir) / "uptodown-index.json"
+PROBE_WORKERS = 8
+
+_index_lock = threading.Lock()
+
+def _load_index() -> dict:
+    try:
+        with INDEX_PATH.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _update_index(package: str, **fields) -> None:
+    """Merge fields into a package entry, re-reading the file so parallel builds do not clobber it"""
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # The thread lock covers this process, the file lock the other fleet workers
+    with _index_lock, open(INDEX_PATH.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        index = _load_index()
+        entry = index.setdefault(package, {})
+        for key, value in fields.items():
+            if value is None:
+                entry.pop(key, None)
+            else:
+                entry[key] = value
+
+        tmp_path = INDEX_PATH.with_name(f"{INDEX_PATH.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, INDEX_PATH)
+
+def _probe(uptodown_name: str) -> bool:
+    try:
+        response = session.head(f"https://{uptodown_name}.en.uptodown.com/android", timeout=10)
+        return response.status_code == 200
+    except Exception as e:
+        logging.debug(f"Probe {uptodown_name} failed: {str(e)[:50]}...")
+        return False
+
+def _confirm(uptodown_name: str, package: str) -> bool:
+    """True when the app page of a slug is the one for package, not a namesake"""
+    try:
+        response = session.get(f"https://{uptodown_name}.en.uptodown.com/android", timeout=10)
+        # Whole package id only, so com.example.app does not match com.example.app.beta
+        pattern = rf"(?<![\w.]){re.escape(package)}(?![\w.])"
+        return response.status_code == 200 and re.search(pattern, response.text) is not None
+    except Exception as e:
+        logging.debug(f"Confirming {uptodown_name} failed: {str(e)[:50]}...")
+        return False
+
+def find_uptodown_name(config: dict, skip: str = None) -> str | None:
+    """Return the Uptodown subdomain of an app, from the index or by probing candidates concurrently"""
+    package = config.get('package', '')
+    cached = _load_index().get(package, {}).get('slug')
+    if cached and cached != skip:
+        return cached
+
+    possible_names = [name for name in generate_possible_uptodown_names(config) if name != skip]
+    logging.info(f"Probing {len(possible_names)} possible Uptodown names for {config.get('name')}")
+
+    pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+    try:
+        futures = [pool.submit(_probe, name) for name in possible_names]
+        # Probes run concurrently, but candidates are taken in order of preference
+        for uptodown_name, future in zip(possible_names, futures):
+            if not future.result():
+                continue
+            if not _confirm(uptodown_name, package):
+                logging.debug(f"✗ {uptodown_name} is not the page of {package}")
+                continue
+            logging.info(f"✓ Found Uptodown name: {uptodown_name}")
+            _update_index(package, slug=uptodown_name)
+            return uptodown_name
+    finally:
+        # Stop as soon as one candidate is confirmed
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return None
+
+def _open_versions_page(config: dict):
+    """Fetch the versions page, re-probing once if the indexed name went stale"""
+    skip = None
+    for _ in range(2):
+        uptodown_name = find_uptodown_name(config, skip=skip)
+        if not uptodown_name:
+            return None, None
+
+        base_url = f"https://{uptodown_name}.en.uptodown.com/android"
+        response = session.get(f"{base_url}/versions")
+        if response.status_code == 200:
+            return base_url, response
+
+        logging.debug(f"✗ {base_url}/versions returned {response.status_code}")
+        _update_index(config.get('package', ''), slug=None, data_code=None, versions=None)
+        skip = uptodown_name
+
+    return None, None
 
 def get_latest_version(app_name: str, config: dict) -> str:
-    # Generate all possible Uptodown names
-    possible_names = generate_possible_uptodown_names(config)
-    
-    logging.info(f"Trying {len(possible_names)} possible Uptodown names for {app_name}")
+    base_url, response = _open_versions_page(config)
+    if response is None:
+        raise Exception(f"Could not find Uptodown page for {app_name}")
+
+    logging.info(f"✓ Found: {response.url}")
+    soup = markup.parse(response.content, markup.UPTODOWN_VERSIONS)
+    version_spans = soup.select('#versions-items-list .version')
+    versions = [span.text.strip() for span in version_spans]
     
-    for uptodown_name in possible_names:
-        url = f"https://{uptodown_name}.en.uptodown.com/android/versions"
-        try:
-            response = session.get(url)
-            if response.status_code == 200:
-                content_size = len(response.content)
-                logging.info(f"✓ Found: {response.url}")
-                soup = BeautifulSoup(response.content, "html.parser")
-                version_spans = soup.select('#versions-items-list .version')
-                versions = [span.text for span in version_spans]
-                
-                if versions:
-                    highest_version = max(versions)
-                    logging.info(f"Found version {highest_version} for {app_name}")
-                    return highest_version
-            elif response.status_code == 404:
-                logging.debug(f"✗ Not found: {url}")
-                continue
-            else:
-                response.raise_for_status()
-        except Exception as e:
-            logging.debug(f"Failed for {url}: {str(e)[:50]}...")
-            continue
+    if versions:
+        # Compare numerically, so 19.10 beats 19.9
+        highest_version = utils.get_highest_version(versions)
+        logging.info(f"Found version {highest_version} for {app_name}")
+        return highest_version
+
+    raise Exception(f"No versions listed on Uptodown for {app_name}")
+
+def _version_url(entry: dict) -> str:
+    version_url_parts = entry["versionURL"]
+    return f"{version_url_parts['url']}/{version_url_parts['extraURL']}/{version_url_parts['versionID']}"
+
+def find_version_url(version: str, app_name: str, config: dict) -> str | None:
+    """Look up the page URL of a version, from the index or by paging the version list"""
+    package = config.get('package', '')
+    entry = _load_index().get(package, {})
+    if version in entry.get('versions', {}):
+        return entry['versions'][version]
+
+    data_code = entry.get('data_code')
+    base_url = f"https://{entry['slug']}.en.uptodown.com/android" if entry.get('slug') else None
+    if not data_code or not base_url:
+        base_url, response = _open_versions_page(config)
+        if response is None:
+            return None
+        soup = markup.parse(response.content, markup.UPTODOWN_APP_NAME)
+        data_code = soup.find('h1', id='detail-app-name')['data-code']
+
+    logging.info(f"Searching {base_url} for {app_name} v{version}")
+    target = utils.normalize_version(version)
+    versions = {}
+    page = 1
+    while True:
+        response = session.get(f"{base_url}/apps/{data_code}/versions/{page}")
+        response.raise_for_status()
+        version_data = response.json().get('data', [])
+        
+        if not version_data:
+            break
+
+        for item in version_data:
+            versions.setdefault(item["version"], _version_url(item))
+        if version in versions:
+            break
+
+        # Pages are newest first, so once a page goes below the target it cannot appear later
+        if min(utils.normalize_version(item["version"]) for item in version_data) < target:
+            break
+        page += 1
+
+    _update_index(package, data_code=data_code, versions={**entry.get('versions', {}), **versions})
+    return versions.get(version)
+
+def _get_download_button(version_url: str):
+    version_page = session.get(version_url)
+    version_page.raise_for_status()
+    soup = markup.parse(version_page.content, markup.UPTODOWN_DOWNLOAD_BUTTON)
     
-    raise Exception(f"Could not find Uptodown page for {app_name}")
+    button = soup.find('button', id='detail-download-button')
+    if not button:
+        return None
+        
+    onclick = button.get('onclick', '')
+    if onclick and "download-link-deeplink" in onclick:
+        version_page = session.get(version_url + '-x')
+        version_page.raise_for_status()
+        soup = markup.parse(version_page.content, markup.UPTODOWN_DOWNLOAD_BUTTON)
+        button = soup.find('button', id='detail-download-button')
+
+    return button
 
 def get_download_link(version: str, app_name: str, config: dict) -> str:
-    # Generate all possible Uptodown names
-    possible_names = generate_possible_uptodown_names(config)
-    
-    logging.info(f"Searching {len(possible_names)} possible Uptodown names for {app_name} v{version}")
-    
-    for uptodown_name in possible_names:
-        base_url = f"https://{uptodown_name}.en.uptodown.com/android"
+    package = config.get('package', '')
+
+    for attempt in range(2):
         try:
-            response = session.get(f"{base_url}/versions")
-            if response.status_code != 200:
-                continue
-                
-            soup = BeautifulSoup(response.content, "html.parser")
-            data_code = soup.find('h1', id='detail-app-name')['data-code']
-
-            page = 1
-            while True:
-                response = session.get(f"{base_url}/apps/{data_code}/versions/{page}")
-                response.raise_for_status()
-                version_data = response.json().get('data', [])
-                
-                if not version_data:
-                    break
-                    
-                for entry in version_data:
-                    if entry["version"] == version:
-                        version_url_parts = entry["versionURL"]
-                        version_url = f"{version_url_parts['url']}/{version_url_parts['extraURL']}/{version_url_parts['versionID']}"
-                        version_page = session.get(version_url)
-                        version_page.raise_for_status()
-                        soup = BeautifulSoup(version_page.content, "html.parser")
-                        
-                        button = soup.find('button', id='detail-download-button')
-                        if not button:
-                            continue
-                            
-                        onclick = button.get('onclick', '')
-                        if onclick and "download-link-deeplink" in onclick:
-                            version_url += '-x'
-                            version_page = session.get(version_url)
-                            version_page.raise_for_status()
-                            soup = BeautifulSoup(version_page.content, "html.parser")
-                            button = soup.find('button', id='detail-download-button')
-                        
-                        if button and 'data-url' in button.attrs:
-                            download_url = button['data-url']
-                            return f"https://dw.uptodown.com/dwn/{download_url}"
-                
-                if all(entry["version"] < version for entry in version_data):
-                    break
-                page += 1
+            version_url = find_version_url(version, app_name, config)
+            if not version_url:
+                break
+
+            button = _get_download_button(version_url)
+            if button and 'data-url' in button.attrs:
+                download_url = button['data-url']
+                return f"https://dw.uptodown.com/dwn/{download_url}"
+            break
         except Exception as e:
-            logging.debug(f"Pattern {uptodown_name} failed: {str(e)[:50]}...")
-            continue
+            # Cached data code or version URLs may be stale, forget them and list again
+            logging.debug(f"Uptodown lookup failed: {str(e)[:50]}...")
+            _update_index(package, data_code=None, versions=None)
     
     logging.error(f"Version {version} not found for {app_name}")
     return None
@@ -98,45 +215,45 @@ def generate_possible_uptodown_names(config: dict) -> list:
     app_name = config.get('name', '')
     package = config.get('package', '')
     
-    possible_names = set()
+    possible_names = []
     
     # 1. Basic variations
-    possible_names.add(app_name)
-    possible_names.add(app_name.replace('-', ''))
-    possible_names.add(app_name.replace('-plus', 'plus'))
-    possible_names.add(app_name.replace('-', '_'))
+    possible_names.append(app_name)
+    possible_names.append(app_name.replace('-', ''))
+    possible_names.append(app_name.replace('-plus', 'plus'))
+    possible_names.append(app_name.replace('-', '_'))
     
     # 2. Package name variations
     package_dash = package.replace('.', '-')
-    possible_names.add(package_dash)
+    possible_names.append(package_dash)
     
     # Common TLD patterns (com-, org-, net-)
     if package.startswith('com.'):
-        possible_names.add(package_dash)
-        possible_names.add(package_dash.replace('com-', ''))
+        possible_names.append(package_dash)
+        possible_names.append(package_dash.replace('com-', ''))
         
         # com-package variations
         parts = package.split('.')
         if len(parts) >= 2:
             # com-appname
-            possible_names.add(f"com-{parts[1]}")
+            possible_names.append(f"com-{parts[1]}")
             # com-appname-lastpart
-            possible_names.add(f"com-{parts[1]}-{parts[-1]}")
+            possible_names.append(f"com-{parts[1]}-{parts[-1]}")
             # appname only
-            possible_names.add(parts[1])
-            possible_names.add(parts[-1])
+            possible_names.append(parts[1])
+            possible_names.append(parts[-1])
             
             # For multi-part packages like com.disney.disneyplus
             if len(parts) >= 3:
-                possible_names.add(f"com-{parts[1]}{parts[2]}")
-                possible_names.add(f"com-{parts[1]}{parts[2]}-mea")
-                possible_names.add(f"com-{'-'.join(parts[1:])}")
+                possible_names.append(f"com-{parts[1]}{parts[2]}")
+                possible_names.append(f"com-{parts[1]}{parts[2]}-mea")
+                possible_names.append(f"com-{'-'.join(parts[1:])}")
     
     # 3. Common suffixes (these cover 99% of cases)
     suffixes = ['', '-android', '-mobile', '-mea', '-plus', '-pro', '-lite', '-hd', '-apk']
     for suffix in suffixes:
-        possible_names.add(app_name + suffix)
-        possible_names.add(package_dash + suffix)
+        possible_names.append(app_name + suffix)
+        possible_names.append(package_dash + suffix)
     
     # 4. Company/app combinations
     # Extract company name from package (first meaningful part after TLD)
@@ -144,25 +261,24 @@ def generate_possible_uptodown_names(config: dict) -> list:
     if len(parts) >= 2:
         company = parts[1]
         app_basename = parts[-1]
-        possible_names.add(f"{company}-{app_basename}")
-        possible_names.add(f"{company}-{app_name}")
+        possible_names.append(f"{company}-{app_basename}")
+        possible_names.append(f"{company}-{app_name}")
         
         # For apps like Adobe
         if 'adobe' in package.lower():
-            possible_names.add(f"adobe-{app_basename}")
-            possible_names.add(f"adobe-{app_basename}-mobile")
+            possible_names.append(f"adobe-{app_basename}")
+            possible_names.append(f"adobe-{app_basename}-mobile")
     
     # 5. Remove common words and try variations
     clean_name = app_name
     for word in ['plus', 'pro', 'lite', 'free', 'paid', 'mod']:
         if word in clean_name:
             clean = clean_name.replace(f'-{word}', '').replace(word, '')
-            possible_names.add(clean)
-            possible_names.add(f"{clean}-{word}")
+            possible_names.append(clean)
+            possible_names.append(f"{clean}-{word}")
     
     # 6. All lowercase
-    lowercase_names = {name.lower() for name in possible_names}
-    possible_names.update(lowercase_names)
+    possible_names += [name.lower() for name in possible_names]
     
-    # Clean up: remove None/empty, deduplicate
-    return [name for name in possible_names if name and len(name) > 1]
+    # Clean up: remove None/empty, deduplicate keeping the most likely names first
+    return list(dict.fromkeys(name for name in possible_names if name and len(name) > 1))
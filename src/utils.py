@@ -1,14 +1,19 @@
+import os
 import re
 import logging
 import cgi
 import json
+import hashlib
 from typing import List, Optional, Union
-from src import gh
+from src import cache_dir, jvm, github_api
 from sys import exit
 import subprocess
 from pathlib import Path
 from urllib.parse import urlparse, unquote, parse_qs
 
+# Parsed list-versions tables, one file per patches sha256
+VERSIONS_CACHE_DIR = Path(cache_dir) / "versions"
+
 def find_file(files: list[Path], prefix: str = None, suffix: str = None, contains: str = None, exclude: list = None) -> Path | None:
     """Find a file with various matching criteria"""
     if exclude is None:
@@ -53,6 +58,11 @@ def find_file(files: list[Path], prefix: str = None, suffix: str = None, contain
     
     return None
 
+def find_apksigner_jar(apksigner: str) -> Path | None:
+    """apksigner.jar next to the apksigner wrapper script, so it can run under jvm.run"""
+    jar = Path(apksigner).parent / "lib" / "apksigner.jar"
+    return jar if jar.exists() else None
+
 def find_apksigner() -> str | None:
     sdk_root = Path("/usr/local/lib/android/sdk")
     build_tools_dir = sdk_root / "build-tools"
@@ -132,29 +142,88 @@ def get_highest_version(versions: list[str]) -> str | None:
             highest_version = v
     return highest_version
 
-def get_supported_version(package_name: str, cli: str, patches: str) -> Optional[str]:
-    output = run_process([
-        'java', '-jar', cli,
-        'list-versions',
-        '-f', package_name,
-        patches
-    ], capture=True, silent=True)
+_file_hashes = {}
 
-    if not output:
-        logging.warning("No output returned from list-versions command")
-        return None
+def file_sha256(path: Path | str) -> str:
+    """sha256 of a file, memoized per (path, size, mtime) for the current run"""
+    path = Path(path)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        hasher = hashlib.sha256()
+        with path.open("rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                hasher.update(block)
+        _file_hashes[key] = hasher.hexdigest()
+    return _file_hashes[key]
 
-    lines = output.splitlines()
-    if len(lines) <= 2:
-        logging.warning("Output has no version lines")
-        return None
+def parse_list_versions(output: str) -> dict[str, list[str]]:
+    """Parse list-versions output into {package: [versions]}, skipping "Any" entries"""
+    table = {}
+    package = None
+    for line in output.splitlines():
+        match = re.search(r'Package name:\s*(\S+)', line)
+        if match:
+            package = match.group(1)
+            table.setdefault(package, [])
+            continue
+        if package is None or 'compatible versions' in line.lower():
+            continue
 
-    versions = []
-    for line in lines[2:]:
-        version, _, _ = line.partition(' ')
-        version = version.strip()
+        version, _, _ = line.strip().partition(' ')
         if version and 'Any' not in line:
-            versions.append(version)
+            table[package].append(version)
+    return table
+
+def _load_versions_cache(path: Path) -> dict:
+    try:
+        with path.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"complete": False, "packages": {}}
+
+def _save_versions_cache(path: Path, table: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(table, f)
+    os.replace(tmp_path, path)
+
+def get_supported_versions(package_name: str, cli: str, patches: str) -> list[str]:
+    """Versions of package_name supported by a patches file, cached on disk by its sha256"""
+    cache_path = VERSIONS_CACHE_DIR / f"{file_sha256(patches)}.json"
+    table = _load_versions_cache(cache_path)
+
+    if not table["complete"]:
+        # One JVM call fills the table for every package in the bundle
+        output = jvm.run(cli, [
+            'list-versions',
+            patches
+        ], probe=['--help'], capture=True, silent=True, check=False)
+        parsed = parse_list_versions(output or "")
+        if parsed:
+            table = {"complete": True, "packages": parsed}
+            _save_versions_cache(cache_path, table)
+            logging.info(f"Cached supported versions of {len(parsed)} packages for {Path(patches).name}")
+
+    if package_name in table["packages"]:
+        return table["packages"][package_name]
+    if table["complete"]:
+        return []
+
+    # CLI could not list every package at once, ask for this one only
+    output = jvm.run(cli, [
+        'list-versions',
+        '-f', package_name,
+        patches
+    ], probe=['--help'], capture=True, silent=True)
+    versions = parse_list_versions(output or "").get(package_name, [])
+    table["packages"][package_name] = versions
+    _save_versions_cache(cache_path, table)
+    return versions
+
+def get_supported_version(package_name: str, cli: str, patches: str) -> Optional[str]:
+    versions = get_supported_versions(package_name, cli, patches)
 
     if not versions:
         logging.warning("No supported versions found")
@@ -183,41 +252,7 @@ def extract_filename(response, fallback_url=None) -> str:
     return unquote(Path(path).name)
 
 def detect_github_release(user: str, repo: str, tag: str) -> dict:
-    repo_obj = gh.get_repo(f"{user}/{repo}")
-
-    if tag == "latest":
-        release = repo_obj.get_latest_release()
-        logging.info(f"Fetched latest release: {release.tag_name}")
-        return release.raw_data
-
-    if tag in ["", "dev", "prerelease"]:
-        releases = list(repo_obj.get_releases())
-        if not releases:
-            raise ValueError(f"No releases found for {user}/{repo}")
-
-        if tag == "":
-            release = max(releases, key=lambda x: x.created_at)
-        elif tag == "dev":
-            devs = [r for r in releases if 'dev' in r.tag_name.lower()]
-            if not devs:
-                raise ValueError(f"No dev release found for {user}/{repo}")
-            release = max(devs, key=lambda x: x.created_at)
-        else:
-            pres = [r for r in releases if r.prerelease]
-            if not pres:
-                raise ValueError(f"No prerelease found for {user}/{repo}")
-            release = max(pres, key=lambda x: x.created_at)
-
-        logging.info(f"Fetched release: {release.tag_name}")
-        return release.raw_data
-
-    try:
-        release = repo_obj.get_release(tag)
-        logging.info(f"Fetched release: {release.tag_name}")
-        return release.raw_data
-    except Exception as e:
-        logging.error(f"Error fetching release {tag} for {user}/{repo}: {e}")
-        raise
+    return github_api.get_release(user, repo, tag)
 
 def detect_source_type(cli_file: Path, patches_file: Path) -> str:
     """Detect if we're using Morphe or ReVanced based on downloaded files"""